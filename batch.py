@@ -0,0 +1,222 @@
+from lib import *
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import csv
+import io
+import json
+
+
+def parse_permutation(line):
+    """
+    Parses a whitespace separated permutation, i.e. 3 1 2 -4 -5 -6 7 8.
+
+    Parameters
+    ----------
+    line: str
+        Line which contains the permutation.
+
+    Returns
+    -------
+    list
+        List of integers which represents the permutation.
+    """
+    return [int(x) for x in line.split()]
+
+
+def scenario_record(scenario):
+    """
+    Returns a dict representation of a sorting scenario which can be serialized
+    as JSON.
+
+    Parameters
+    ----------
+    scenario: Scenario
+        Sorting scenario as returned by sort_scenario.
+
+    Returns
+    -------
+    dict
+        Contains the input permutation, the identity (if any), the distance and
+        for each permutation_k, k = distance, ..., 1 the permutation, its
+        misc-encoding, the pattern, and the TDRL/iTDRL γ_k.
+    """
+    record = {"permutation": scenario.permutation}
+    if scenario.identity is not None:
+        record["identity"] = scenario.identity
+    record["distance"] = scenario.distance
+    record["steps"] = [{"k": step.k,
+                        "permutation": step.permutation,
+                        "encoding": "".join([_[0] for _ in step.misc_dec]),
+                        "pattern": step.pattern[1],
+                        "operation": step.operation,
+                        "L": step.L,
+                        "R": step.R} for step in scenario.steps[:-1]]
+    return record
+
+
+def format_record(record, fmt):
+    """
+    Formats a record as a single output line (without line break).
+
+    Parameters
+    ----------
+    record: dict
+        Record as returned by scenario_record, or a dict containing "input" and
+        "error" for lines which could not be processed.
+    fmt: str
+        "ndjson", "tsv" or "csv". TSV lines contain the permutation, the distance and
+        the ;-separated TDRL/iTDRL γ_k, ..., γ_1 if the record contains steps.
+        CSV lines contain the same fields.
+
+    Returns
+    -------
+    str
+        Formatted record.
+    """
+    if fmt == "ndjson":
+        return json.dumps(record, separators=(",", ":"))
+
+    if "error" in record:
+        fields = [record["input"], "error: " + record["error"]]
+    elif "steps" not in record:
+        fields = [stringify(record["permutation"])[0:-1], str(record["distance"])]
+    else:
+        operations = ";".join([step["operation"] + " ( " + stringify(step["L"]) + " | " + stringify(step["R"]) + " )"
+                               for step in record["steps"]])
+        fields = [stringify(record["permutation"])[0:-1], str(record["distance"]), operations]
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="").writerow(fields)
+        return buffer.getvalue()
+
+    return "\t".join(fields)
+
+
+def process_line(line, identity=None, fmt="ndjson", distance_only=False):
+    """
+    Sorts the permutation given in one input line and formats the result.
+
+    A line contains a whitespace separated permutation, optionally followed by a
+    tab and a whitespace separated identity which overrides the identity argument.
+    If distance_only is set, only the distance is computed and the record does not
+    contain steps.
+
+    Returns
+    -------
+    str
+        Formatted record, see format_record.
+    """
+    try:
+        fields = line.split("\t")
+        permutation = parse_permutation(fields[0])
+        if len(fields) > 1 and fields[1].strip():
+            identity = parse_permutation(fields[1])
+        if distance_only:
+            record = {"permutation": permutation, "distance": distance(permutation, identity)}
+        else:
+            record = scenario_record(sort_scenario(permutation, identity))
+    except (ValueError, IndexError, KeyError) as err:
+        record = {"input": line, "error": str(err) or type(err).__name__}
+
+    return format_record(record, fmt)
+
+
+def process_chunk(lines, identity=None, fmt="ndjson", distance_only=False):
+    """
+    Processes a chunk of input lines, see process_line. The memo and distance
+    table of the process are shared by all chunks.
+    """
+    return [process_line(line, identity, fmt, distance_only) for line in lines]
+
+
+def process_memo_chunk(lines, identity=None, fmt="ndjson", distance_only=False):
+    """
+    Processes a chunk of input lines in a worker process, see process_chunk,
+    and returns the formatted records together with the memo entries which
+    were computed for them, see memo_journal.
+    """
+    with memo_journal() as entries:
+        records = process_chunk(lines, identity, fmt, distance_only)
+    return records, entries
+
+
+def init_worker(memo_path=None, table_path=None):
+    """
+    Initializes a worker process with the memo saved in memo_path and the
+    distance table table_path, if given.
+    """
+    if table_path is not None:
+        load_distance_table(table_path)
+    if memo_path is not None:
+        load_memo(memo_path)
+
+
+def chunked(lines, chunksize):
+    """
+    Groups non-empty lines into lists of at most chunksize lines.
+    """
+    lines = (line.rstrip("\n") for line in lines if line.strip())
+    while True:
+        chunk = list(islice(lines, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(lines, identity=None, fmt="ndjson", jobs=1, chunksize=64, ordered=True, distance_only=False,
+              memo_path=None):
+    """
+    Sorts a stream of permutations, one per line, and yields one output line per
+    input line.
+
+    The input is consumed lazily. At most 4 * jobs chunks are in flight at any
+    time, hence memory is bounded independently of the number of input lines.
+
+    Parameters
+    ----------
+    lines: iterable
+        Input lines, see process_line. Empty lines are skipped.
+    identity: list
+        Optional identity which is used for lines that do not specify one.
+    fmt: str
+        "ndjson", "tsv" or "csv", see format_record.
+    jobs: int
+        Number of worker processes. For jobs <= 1, lines are processed in the
+        current process.
+    chunksize: int
+        Number of lines sent to a worker at once.
+    ordered: bool
+        If True, output lines are yielded in input order. Otherwise they are
+        yielded as soon as their chunk is finished.
+    distance_only: bool
+        If True, only distances are computed, see process_line.
+    memo_path: str
+        Optional file written by save_memo which is loaded by every worker
+        process. The entries the workers compute are then added to the memo of
+        this process, which can be saved afterwards. Lines are looked up in the
+        memo of this process for jobs <= 1.
+
+    Returns
+    -------
+    generator
+        Yields formatted records.
+    """
+    if jobs <= 1:
+        for chunk in chunked(lines, chunksize):
+            yield from process_chunk(chunk, identity, fmt, distance_only)
+        return
+
+    # With a memo file, workers return their new memo entries with the records
+    task = process_chunk if memo_path is None else process_memo_chunk
+    tasks = ((chunk, identity, fmt, distance_only) for chunk in chunked(lines, chunksize))
+
+    # Workers share the distance table of this process
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(memo_path, get_distance_table())) as executor:
+        for _, result in bounded_submit(executor, task, tasks, jobs, ordered):
+            if memo_path is not None:
+                result, entries = result
+                for entry in entries:
+                    memo_store(*entry)
+            yield from result
@@ -0,0 +1,183 @@
+from lib import *
+from math import log2, ceil
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# Stages which are timed for every length n, in the order of the output
+STAGES = ["get_misc_dec", "search", "transformation", "oplus", "sort_scenario"]
+
+
+def parse_args():
+    cli_parser = argparse.ArgumentParser(description="Times every stage of the sorting algorithm on seeded " +
+                                                     "random signed permutations.")
+
+    cli_parser.add_argument("-n", "--sizes", type=str, default="10 100 1000 10000 100000 1000000",
+                            help="space separated lengths of the permutations")
+    cli_parser.add_argument("--repeat", type=int, default=3, help="number of runs per stage; the fastest run counts")
+    cli_parser.add_argument("--seed", type=int, default=0, help="seed of the random permutations")
+    cli_parser.add_argument("-o", "--output", type=str, help="file the results are saved to as JSON")
+    cli_parser.add_argument("--baseline", type=str,
+                            help="JSON file of an earlier run; exits with status 1 if a stage is slower, " +
+                                 "\nor needs more memory, than in the baseline")
+    cli_parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="relative slowdown which is not counted as regression")
+    cli_parser.add_argument("--min-delta", type=float, default=0.001,
+                            help="absolute slowdown in seconds which is not counted as regression")
+    return cli_parser.parse_args()
+
+
+def best_time(func, repeat, setup=None):
+    """
+    Returns the fastest of repeat runs of func in seconds. setup is called before
+    every run and is not timed.
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t1 = time.perf_counter()
+        func()
+        t2 = time.perf_counter()
+        if best is None or t2 - t1 < best:
+            best = t2 - t1
+    return best
+
+
+def peak_memory(func):
+    """
+    Returns the peak memory in bytes which is allocated while func runs.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_size(n, seed, repeat):
+    """
+    Times every stage of STAGES for a random permutation of length n.
+
+    Returns
+    -------
+    dict
+        Contains n, k, the seconds of every stage and the peak memory of
+        sort_scenario in bytes.
+    """
+    permutation = random_permutations(1, n, seed)[0].tolist()
+    misc_dec = get_misc_dec(permutation)
+    k = ceil(log2(len(misc_dec)))
+    timings = {}
+
+    timings["get_misc_dec"] = best_time(lambda: get_misc_dec(permutation), repeat)
+
+    # Repeated runs would otherwise be answered by the memo
+    saved_memo_size = get_memo_size()
+    set_memo_size(0)
+    try:
+        # The pattern and mapping of the search are reused by transformation
+        dist, pattern, mapping = find_pattern(misc_dec)
+        timings["search"] = best_time(lambda: find_pattern(misc_dec), repeat)
+
+        timings["transformation"] = best_time(lambda: transformation(permutation, pattern, misc_dec, mapping),
+                                              repeat)
+
+        # Merges two ascending halves of the elements
+        elements = sorted(abs(x) for x in permutation)
+        misc_1, misc_2 = elements[0::2], elements[1::2]
+        timings["oplus"] = best_time(lambda: oplus(misc_1, misc_2), repeat)
+
+        timings["sort_scenario"] = best_time(lambda: sort_scenario(permutation), repeat)
+        peak = peak_memory(lambda: sort_scenario(permutation))
+    finally:
+        set_memo_size(saved_memo_size)
+
+    return {"n": n, "k": k, "distance": dist, "seconds": timings, "peak_memory": peak}
+
+
+def find_regressions(results, baseline, tolerance, min_delta):
+    """
+    Compares results to the results of an earlier run.
+
+    A stage is a regression if it is slower than in the baseline by more than
+    the relative tolerance and by more than min_delta seconds. The peak memory
+    is a regression if it exceeds the baseline by more than the tolerance.
+
+    Returns
+    -------
+    list
+        Contains a message for every regression.
+    """
+    regressions = []
+    baseline_sizes = {result["n"]: result for result in baseline["results"]}
+
+    for result in results["results"]:
+        if result["n"] not in baseline_sizes:
+            continue
+        base = baseline_sizes[result["n"]]
+
+        for stage, seconds in result["seconds"].items():
+            if stage not in base["seconds"]:
+                continue
+            base_seconds = base["seconds"][stage]
+            if seconds > base_seconds * (1 + tolerance) and seconds - base_seconds > min_delta:
+                regressions.append("n=" + str(result["n"]) + " " + stage + ": " + "%.6f" % seconds +
+                                   "s, baseline " + "%.6f" % base_seconds + "s")
+
+        if result["peak_memory"] > base["peak_memory"] * (1 + tolerance):
+            regressions.append("n=" + str(result["n"]) + " peak memory: " + str(result["peak_memory"]) +
+                               " bytes, baseline " + str(base["peak_memory"]) + " bytes")
+
+    return regressions
+
+
+def print_result(result):
+    """
+    Prints the seconds, and throughput in elements per second, of every stage.
+    """
+    print("n=" + str(result["n"]) + " k=" + str(result["k"]) + " distance=" + str(result["distance"]) +
+          " peak memory=" + str(result["peak_memory"]) + " bytes")
+    for stage in STAGES:
+        seconds = result["seconds"][stage]
+        throughput = result["n"] / seconds if seconds > 0 else float("inf")
+        print("  " + stage.ljust(20) + "%12.6f s" % seconds + "%16.0f elements/s" % throughput)
+    sys.stdout.flush()
+
+
+def main():
+    args = parse_args()
+
+    results = {"python": platform.python_version(),
+               "numpy": np.__version__,
+               "seed": args.seed,
+               "repeat": args.repeat,
+               "results": []}
+
+    for n in [int(x) for x in args.sizes.split()]:
+        result = benchmark_size(n, args.seed, args.repeat)
+        results["results"].append(result)
+        print_result(result)
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, "r") as infile:
+            baseline = json.load(infile)
+
+        regressions = find_regressions(results, baseline, args.tolerance, args.min_delta)
+        for regression in regressions:
+            print("Regression: " + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+from lib import *
+from batch import init_worker
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+from math import factorial
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+def parse_args():
+    cli_parser = argparse.ArgumentParser(description="Computes the distribution of TDRL/iTDRL distances over all " +
+                                                     "signed permutations of length n.")
+
+    cli_parser.add_argument("-n", "--length", type=int, required=True, help="length of the permutations")
+    cli_parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes")
+    cli_parser.add_argument("--max-rows", type=int, default=2 ** 21,
+                            help="maximum number of permutations per shard, at least 2^n; " +
+                                 "shards are processed as one array")
+    cli_parser.add_argument("-c", "--checkpoint", type=str,
+                            help="JSON file the progress is saved to; an existing file is resumed")
+    cli_parser.add_argument("--checkpoint-interval", type=float, default=60.0,
+                            help="seconds between two checkpoints")
+    cli_parser.add_argument("-o", "--output", type=str, help="file the distribution is saved to as JSON")
+    return cli_parser.parse_args()
+
+
+def count_signed_permutations(n):
+    """
+    Returns the number of signed permutations of length n, i.e. 2^n * n!.
+    """
+    return 2 ** n * factorial(n)
+
+
+def rank_signed(permutation):
+    """
+    Computes the rank of a signed permutation.
+
+    Signed permutations are ordered by the lexicographic order of their unsigned
+    permutations, and permutations with equal unsigned permutation by their sign
+    mask, in which bit i is set if the i-th element is negative.
+
+    Parameters
+    ----------
+    permutation: list
+        List of n potentially negative elements where
+        every element occurs exactly once
+
+    Returns
+    -------
+    int
+        Rank in [0, 2^n * n!).
+    """
+    n = len(permutation)
+    remaining = list(range(1, n + 1))
+    index = 0
+    mask = 0
+
+    for i, x in enumerate(permutation):
+        j = remaining.index(abs(x))
+        index += j * factorial(n - 1 - i)
+        remaining.pop(j)
+        if x < 0:
+            mask |= 1 << i
+
+    return index * 2 ** n + mask
+
+
+def unrank_signed(rank, n):
+    """
+    Returns the signed permutation of length n with the given rank, see rank_signed.
+    """
+    index, mask = divmod(rank, 2 ** n)
+    remaining = list(range(1, n + 1))
+    permutation = []
+
+    for i in range(n):
+        j, index = divmod(index, factorial(n - 1 - i))
+        x = remaining.pop(j)
+        permutation.append(-x if mask >> i & 1 else x)
+
+    return permutation
+
+
+def shard_depth(n, max_rows):
+    """
+    Returns the smallest number d of leading elements such that all signed
+    permutations with the same d leading unsigned elements, i.e. a shard of
+    2^n * (n-d)! consecutive ranks, contain at most max_rows permutations.
+
+    The smallest shard contains the 2^n sign masks of one unsigned permutation,
+    hence max_rows must be at least 2^n.
+    """
+    if max_rows < 2 ** n:
+        raise ValueError("max_rows must be at least 2^n = " + str(2 ** n) + " for n=" + str(n))
+
+    depth = 0
+    while 2 ** n * factorial(n - depth) > max_rows:
+        depth += 1
+    return depth
+
+
+def sign_matrix(n):
+    """
+    Returns a (2^n, n) matrix whose row m contains -1 at position i if bit i of m
+    is set, and 1 otherwise.
+    """
+    masks = np.arange(2 ** n, dtype=np.int64)[:, None] >> np.arange(n, dtype=np.int64)
+    return np.where(masks & 1, -1, 1).astype(np.int8)
+
+
+def encoding_keys(permutations):
+    """
+    Computes the misc-encodings of the rows of a matrix of signed permutations
+    as integers.
+
+    Bit i of a key is set if the i-th misc-substring is negative, and the bit
+    after the last misc-substring is set to distinguish encodings of different
+    lengths. Borders of misc-substrings are found as in misc_boundaries.
+
+    Parameters
+    ----------
+    permutations: numpy.ndarray
+        (m, n) integer matrix whose rows are signed permutations.
+
+    Returns
+    -------
+    numpy.ndarray
+        int64 array of length m which contains the key of every row.
+    """
+    negative = permutations < 0
+    border = (permutations[:, :-1] > permutations[:, 1:]) | (negative[:, :-1] != negative[:, 1:])
+
+    keys = negative[:, 0].astype(np.int64)
+    length = np.ones(len(permutations), dtype=np.int64)
+
+    # Every border appends the sign of the next misc-substring
+    for j in range(1, permutations.shape[1]):
+        start = border[:, j - 1]
+        keys |= (negative[:, j] & start).astype(np.int64) << length
+        length += start
+
+    return keys | (np.int64(1) << length)
+
+
+def key_encoding(key):
+    """
+    Returns the misc-encoding of a key, see encoding_keys.
+    """
+    return "".join(["n" if key >> i & 1 else "p" for i in range(key.bit_length() - 1)])
+
+
+def key_distance(key):
+    """
+    Returns the TDRL/iTDRL distance of all permutations whose misc-encoding has
+    the given key. encoding_distance keeps the distances in the memo, see
+    memo_lookup, hence every encoding is searched once per process unless it
+    was evicted.
+    """
+    return encoding_distance(key_encoding(key))
+
+
+def shard_histogram(n, depth, shard):
+    """
+    Computes the distribution of distances over one shard, i.e. all signed
+    permutations of length n whose ranks are in
+    [shard * 2^n * (n-depth)!, (shard + 1) * 2^n * (n-depth)!).
+
+    Returns
+    -------
+    dict
+        Maps each distance to the number of permutations of the shard with this distance.
+    """
+    # The first permutation of the shard has the shared leading elements, followed
+    # by the remaining elements in ascending order.
+    first = unrank_signed(shard * factorial(n - depth) * 2 ** n, n)
+    tails = list(permutations(first[depth:]))
+    tails = np.array(tails, dtype=np.int16).reshape(len(tails), n - depth)
+
+    unsigned = np.empty((len(tails), n), dtype=np.int16)
+    unsigned[:, :depth] = first[:depth]
+    unsigned[:, depth:] = tails
+
+    # All sign masks of every unsigned permutation, in the order of their ranks
+    signed = (unsigned[:, None, :] * sign_matrix(n)[None, :, :]).reshape(-1, n)
+
+    keys, counts = np.unique(encoding_keys(signed), return_counts=True)
+
+    histogram = {}
+    for key, count in zip(keys.tolist(), counts.tolist()):
+        dist = key_distance(key)
+        histogram[dist] = histogram.get(dist, 0) + count
+    return histogram
+
+
+def load_checkpoint(path, n, depth):
+    """
+    Returns the state saved by save_checkpoint, or a new state if path does not exist.
+    """
+    if path is None or not os.path.exists(path):
+        return {"n": n, "depth": depth, "done": [], "histogram": {}}
+
+    with open(path, "r") as infile:
+        state = json.load(infile)
+
+    if state["n"] != n or state["depth"] != depth:
+        raise ValueError("checkpoint " + path + " was created for n=" + str(state["n"]) +
+                         " and depth " + str(state["depth"]))
+
+    state["histogram"] = {int(dist): count for dist, count in state["histogram"].items()}
+    return state
+
+
+def save_checkpoint(path, state):
+    """
+    Atomically writes the state, i.e. the finished shards and their combined
+    distribution, to path.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as outfile:
+        json.dump({"n": state["n"], "depth": state["depth"], "done": sorted(state["done"]),
+                   "histogram": {str(dist): count for dist, count in sorted(state["histogram"].items())}}, outfile)
+    os.replace(outfile.name, path)
+
+
+def run_exhaustive(n, jobs=1, max_rows=2 ** 21, checkpoint=None, checkpoint_interval=60.0):
+    """
+    Computes the distribution of TDRL/iTDRL distances over all 2^n * n! signed
+    permutations of length n.
+
+    The rank space is split into shards of at most max_rows permutations, see
+    shard_depth, which are processed by jobs worker processes. Only the
+    distribution is kept, and each misc-encoding is searched once per process,
+    see key_distance. If checkpoint is given, the finished shards and their
+    distribution are saved every checkpoint_interval seconds, and a run which
+    was stopped resumes with the shards which were not finished.
+
+    Parameters
+    ----------
+    n: int
+        Length of the permutations.
+    jobs: int
+        Number of worker processes. For jobs <= 1, shards are processed in the
+        current process.
+    max_rows: int
+        Maximum number of permutations per shard.
+    checkpoint: str
+        Optional path of the checkpoint file.
+    checkpoint_interval: float
+        Seconds between two checkpoints.
+
+    Returns
+    -------
+    dict
+        Maps each distance to the number of signed permutations with this distance.
+    """
+    depth = shard_depth(n, max_rows)
+    shards = factorial(n) // factorial(n - depth)
+
+    state = load_checkpoint(checkpoint, n, depth)
+    done = set(state["done"])
+    histogram = state["histogram"]
+    todo = [shard for shard in range(shards) if shard not in done]
+    last_checkpoint = time.time()
+
+    def finish(shard, shard_hist):
+        nonlocal last_checkpoint
+        done.add(shard)
+        for dist, count in shard_hist.items():
+            histogram[dist] = histogram.get(dist, 0) + count
+
+        if checkpoint and time.time() - last_checkpoint >= checkpoint_interval:
+            state["done"] = list(done)
+            save_checkpoint(checkpoint, state)
+            last_checkpoint = time.time()
+            print(str(len(done)) + "/" + str(shards) + " shards done", file=sys.stderr)
+
+    if jobs <= 1:
+        for shard in todo:
+            finish(shard, shard_histogram(n, depth, shard))
+    else:
+        # Workers share the distance table of this process
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                 initargs=(None, get_distance_table())) as executor:
+            tasks = ((n, depth, shard) for shard in todo)
+            for (_, _, shard), shard_hist in bounded_submit(executor, shard_histogram, tasks, jobs, ordered=False):
+                finish(shard, shard_hist)
+
+    if checkpoint:
+        state["done"] = list(done)
+        save_checkpoint(checkpoint, state)
+
+    return histogram
+
+
+def main():
+    args = parse_args()
+    if args.max_rows < 2 ** args.length:
+        sys.exit("exhaustive.py: error: --max-rows must be at least 2^n = " + str(2 ** args.length))
+
+    histogram = run_exhaustive(args.length, args.jobs, args.max_rows, args.checkpoint, args.checkpoint_interval)
+
+    print("Distance\tPermutations")
+    for dist in sorted(histogram):
+        print(str(dist) + "\t" + str(histogram[dist]))
+    print("Total\t" + str(sum(histogram.values())))
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump({"n": args.length,
+                       "histogram": {str(dist): count for dist, count in sorted(histogram.items())}}, outfile)
+
+
+if __name__ == "__main__":
+    main()
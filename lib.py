@@ -1,4 +1,257 @@
 import json
+import os
+import re
+from array import array
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import as_completed, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from itertools import chain
+from math import log2, ceil
+import numpy as np
+
+
+# One row of a sorting scenario. permutation_k together with its misc-decomposition,
+# the pattern its misc-encoding is subsequence of, and the subsequence mapping.
+# operation, L and R describe the TDRL/iTDRL γ_k which yields permutation_k when
+# applied to permutation_k-1; they are None for permutation_0.
+# If the scenario has an identity, relabeled, relabeled_encoding, relabeled_L and
+# relabeled_R contain permutation_k, its misc-encoding, L and R relabeled by
+# identity; otherwise they are None.
+Step = namedtuple("Step", ["k", "permutation", "misc_dec", "pattern", "mapping", "operation", "L", "R",
+                           "relabeled", "relabeled_encoding", "relabeled_L", "relabeled_R"],
+                  defaults=(None, None, None, None))
+
+# Optimal sorting scenario. steps is ordered from permutation_k down to permutation_0.
+Scenario = namedtuple("Scenario", ["distance", "permutation", "identity", "steps"])
+
+class Permutation(array):
+    """
+    Compact representation of a permutation.
+
+    The elements are stored in an array('i'), i.e. 4 bytes per element instead of
+    a pointer to an int object per element for lists. Permutations are treated as
+    immutable: the misc-decomposition is computed once and cached, and
+    misc-substrings are returned as memoryviews into the permutation without
+    copying. get_misc_dec, inverse, composition, reverse and transformation
+    return Permutations for Permutations.
+
+    Parameters
+    ----------
+    elements: iterable
+        Potentially negative elements where every element occurs exactly once,
+        or the bytes of an array('i').
+    """
+    __slots__ = ("_misc_dec",)
+
+    def __new__(cls, elements=()):
+        self = super().__new__(cls, "i", elements)
+        self._misc_dec = None
+        return self
+
+    def __reduce__(self):
+        return self.__class__, (self.tobytes(),)
+
+    @property
+    def misc_dec(self):
+        """
+        Cached misc-decomposition, see get_misc_dec.
+        """
+        if self._misc_dec is None:
+            self._misc_dec = get_misc_dec(memoryview(self))
+        return self._misc_dec
+
+    def misc(self, i):
+        """
+        Returns the i-th misc-substring as a memoryview into the permutation.
+        """
+        misc = self.misc_dec[i]
+        return memoryview(self)[misc[1]:misc[2]]
+
+    def to_numpy(self):
+        """
+        Returns the elements as an int32 NumPy array which shares the memory of
+        the permutation.
+        """
+        return np.frombuffer(self, dtype=np.intc)
+
+
+# Pattern types, i.e. the types of TDRL/iTDRL.
+PATTERN_TYPES = ["TDRL", "riTDRL", "liTDRL"]
+
+# Implicit form of a pattern of length 2^k, see pattern_recipes: its type, its
+# first character and the length of its runs, which alternate between p and n.
+PatternRecipe = namedtuple("PatternRecipe", ["type", "first", "run_length", "k"])
+
+# Translation table from p/n strings to binary digits, see pack_encoding.
+_PACK_TABLE = str.maketrans("pn", "01")
+
+# Encodings with at most this many runs per character of a pattern are mapped by
+# run-length jumps, see subseq_mapping.
+RUN_JUMP_RATIO = 1 / 64
+
+# Maximal substrings of equal characters of a misc-encoding.
+_RUN_REGEX = re.compile("p+|n+")
+
+# Permutations of at least this length are decomposed by the NumPy backend.
+NUMPY_MIN_LENGTH = 256
+
+# Stages and counters reported by profile.
+PROFILE_STAGES = ["misc_decomposition", "pattern_search", "transformation", "output"]
+PROFILE_COUNTERS = ["patterns_tried", "subseq_comparisons", "oplus_calls", "oplus_elements", "buffer_elements",
+                    "retained_blocks"]
+
+# Statistics of the active profile, see profile. None if profiling is disabled,
+# in which case instrumented code only tests this variable.
+_profile = None
+
+# Start time, and time spent in nested stages, of every stage which is being timed.
+_profile_stack = []
+
+# Misc-encodings of at most MEMO_MAX_LENGTH characters are memoized, see memo_lookup.
+MEMO_MAX_LENGTH = 4096
+
+# Maximum number of memoized misc-encodings; 0 disables the memo.
+_memo_size = 65536
+
+# Maximum memory of the memo in bytes, see set_memo_max_bytes.
+_memo_max_bytes = 64 * 2 ** 20
+
+# Approximate memory of a memo entry besides its misc-encoding, i.e. the entry
+# tuple and the node of the OrderedDict, in bytes.
+MEMO_ENTRY_OVERHEAD = 128
+
+# Memoized (distance, pattern index) by misc-encoding, in least recently used order.
+_memo = OrderedDict()
+
+# Approximate memory of all memo entries in bytes.
+_memo_bytes = 0
+
+# Hits, misses and evictions of the memo.
+_memo_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# Entries stored within the active memo_journal, or None.
+_memo_journal = None
+
+# Entry of the distance table of every misc-encoding, see load_distance_table.
+# pattern is the index of the first pattern in get_patterns(distance), or
+# TABLE_NO_PATTERN if none matches.
+TABLE_DTYPE = np.dtype([("distance", np.uint8), ("pattern", np.uint16)])
+TABLE_NO_PATTERN = 0xFFFF
+
+# Memory-mapped distance table, its path, and the maximum encoding length it contains.
+_table = None
+_table_path = None
+_table_length = 0
+
+# Memory maps of output files which are written by this process, by path, see worker_memmap.
+_worker_memmaps = {}
+
+
+@contextmanager
+def profile(trace_memory=True):
+    """
+    Collects timings and counters of all computations within its context.
+
+    Timings are in seconds and exclusive, i.e. time spent in a stage which is
+    timed within another stage only counts for the inner stage. The counters
+    contain the number of patterns tried before a match, the character
+    comparisons in subseq_mapping, the number of merges and merged elements in
+    oplus, the elements of the buffers allocated by transformation, and the
+    net change of the number of memory blocks allocated by the interpreter,
+    see sys.getallocatedblocks. The latter counts blocks which are retained
+    after the context, not allocations, and is negative if more blocks were
+    freed than allocated, e.g. when the memo evicts entries. When no profile
+    is active, the instrumented functions only test whether one is.
+
+    Parameters
+    ----------
+    trace_memory: bool
+        If True, the peak memory is measured by tracemalloc, which slows down
+        all allocations while the profile is active.
+
+    Returns
+    -------
+    dict
+        Dict which contains "timings", "counters", "memo" (hits, misses and
+        evictions of the memo, see memo_lookup) and "peak_memory" (bytes, or
+        None without trace_memory) and is filled in when the context exits.
+        It can be serialized as JSON.
+    """
+    global _profile
+    stats = {"timings": {stage: 0.0 for stage in PROFILE_STAGES},
+             "counters": {counter: 0 for counter in PROFILE_COUNTERS},
+             "memo": None,
+             "peak_memory": None}
+    memo_stats = dict(_memo_stats)
+
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    elif trace_memory:
+        tracemalloc.reset_peak()
+
+    blocks = sys.getallocatedblocks()
+    previous, previous_stack = _profile, _profile_stack[:]
+    _profile = stats
+    del _profile_stack[:]
+    try:
+        yield stats
+    finally:
+        _profile = previous
+        _profile_stack[:] = previous_stack
+        stats["counters"]["retained_blocks"] = sys.getallocatedblocks() - blocks
+        stats["memo"] = {key: _memo_stats[key] - memo_stats[key] for key in memo_stats}
+        if trace_memory:
+            stats["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        if start_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def profile_stage(stage):
+    """
+    Times its context as stage of the active profile, see profile. Does nothing
+    if no profile is active.
+    """
+    if _profile is None:
+        yield
+        return
+
+    _profile_start()
+    try:
+        yield
+    finally:
+        _profile_stop(stage)
+
+
+def _profile_start():
+    """
+    Starts timing a stage of the active profile.
+    """
+    _profile_stack.append([time.perf_counter(), 0.0])
+
+
+def _profile_stop(stage):
+    """
+    Stops timing the last started stage and adds its time, without the time of
+    stages nested into it, to the active profile.
+    """
+    start, nested = _profile_stack.pop()
+    elapsed = time.perf_counter() - start
+    _profile["timings"][stage] += elapsed - nested
+    if _profile_stack:
+        _profile_stack[-1][1] += elapsed
+
+
+def _profile_count(counter, n):
+    """
+    Adds n to a counter of the active profile.
+    """
+    _profile["counters"][counter] += n
 
 
 def get_misc_dec(permutation):
@@ -7,7 +260,9 @@ def get_misc_dec(permutation):
 
     Passes the permutation exactly once and returns a list of tuples
     which contains the border indices, and the type, of each misc-substring
-    of a permutation.
+    of a permutation. NumPy arrays, and permutations with at least
+    NUMPY_MIN_LENGTH elements, are passed to get_misc_dec_np instead. For a
+    Permutation, its cached misc-decomposition is returned.
 
     Parameters
     ----------
@@ -26,6 +281,16 @@ def get_misc_dec(permutation):
         is not contained in the substring anymore, or len(permutation).
     """
 
+    if isinstance(permutation, Permutation):
+        return permutation.misc_dec
+
+    if isinstance(permutation, np.ndarray) or len(permutation) >= NUMPY_MIN_LENGTH:
+        return get_misc_dec_np(permutation)
+
+    # A single element is one misc-substring; the loop below starts at the second element
+    if len(permutation) == 1:
+        return [("p" if permutation[0] > 0 else "n", 0, 1)]
+
     misc_dec = []
 
     # Beginning of current misc
@@ -55,440 +320,1790 @@ def get_misc_dec(permutation):
                 else:
                     misc_dec += [("n", last_boundary, i)]
 
-        # Remember last seen element
-        last_element = permutation[i]
+        # Remember last seen element
+        last_element = permutation[i]
+
+    # adjust last index for easier slicing in transformation
+    misc_dec[-1] = (misc_dec[-1][0], misc_dec[-1][1], misc_dec[-1][2] + 1)
+
+    return misc_dec
+
+
+def misc_boundaries(permutation):
+    """
+    Computes the borders and signage of all misc-substrings of a permutation at once.
+
+    A new misc-substring starts at every descent, and at every change of sign,
+    which are found by vectorized comparisons of neighbouring elements.
+
+    Parameters
+    ----------
+    permutation: list or numpy.ndarray
+        n potentially negative elements where every element occurs exactly once.
+        Integer arrays are used without conversion.
+
+    Returns
+    -------
+    tuple
+        (boundaries, signs). boundaries is an integer array of length #miscs + 1,
+        such that the i-th misc-substring is permutation[boundaries[i]:boundaries[i+1]].
+        signs is a boolean array of length #miscs which is True for positive,
+        i.e. p, misc-substrings.
+    """
+    permutation = np.asarray(permutation)
+    negative = permutation < 0
+
+    # Descents, and changes of sign
+    border = (permutation[:-1] > permutation[1:]) | (negative[:-1] != negative[1:])
+
+    boundaries = np.empty(np.count_nonzero(border) + 2, dtype=np.int64)
+    boundaries[0] = 0
+    boundaries[1:-1] = np.flatnonzero(border) + 1
+    boundaries[-1] = len(permutation)
+
+    return boundaries, ~negative[boundaries[:-1]]
+
+
+def get_misc_dec_np(permutation):
+    """
+    Computes the misc-decomposition of a permutation with the NumPy backend.
+
+    Returns the same list of tuples "(c_i,start,end)" as get_misc_dec, see
+    misc_boundaries.
+    """
+    boundaries, signs = misc_boundaries(permutation)
+    boundaries = boundaries.tolist()
+    chars = np.where(signs, "p", "n").tolist()
+
+    return list(zip(chars, boundaries[:-1], boundaries[1:]))
+
+
+def get_misc_encoding(permutation):
+    """
+    Computes and returns only the misc-encoding of a permutation.
+
+    Passes the permutation exactly once like get_misc_dec, but does not create
+    the tuples of the misc-decomposition.
+
+    Parameters
+    ----------
+    permutation: list
+        List of n potentially negative elements where
+        every element occurs exactly once
+
+    Returns
+    -------
+    str
+        Misc-encoding of permutation, i.e. one character p/n per misc-substring.
+    """
+    if isinstance(permutation, np.ndarray) or len(permutation) >= NUMPY_MIN_LENGTH:
+        signs = misc_boundaries(permutation)[1]
+        return np.where(signs, ord("p"), ord("n")).astype(np.uint8).tobytes().decode("ascii")
+
+    encoding = ["p" if permutation[0] > 0 else "n"]
+
+    # Last element seen
+    last_element = permutation[0]
+
+    for element in permutation:
+
+        # Check if the border of a new misc is reached
+        if last_element > element or last_element * element < 0:
+            encoding.append("p" if element > 0 else "n")
+
+        last_element = element
+
+    return "".join(encoding)
+
+
+def get_memo_size():
+    """
+    Returns the maximum number of misc-encodings in the memo.
+    """
+    return _memo_size
+
+
+def set_memo_size(size):
+    """
+    Sets the maximum number of misc-encodings in the memo, see memo_lookup.
+    Least recently used encodings are removed if the memo is larger.
+
+    Parameters
+    ----------
+    size: int
+        Maximum number of misc-encodings; 0 disables the memo.
+    """
+    global _memo_size
+    _memo_size = size
+    _memo_evict()
+
+
+def get_memo_max_bytes():
+    """
+    Returns the maximum memory of the memo in bytes.
+    """
+    return _memo_max_bytes
+
+
+def set_memo_max_bytes(max_bytes):
+    """
+    Sets the maximum memory of the memo, see memo_lookup. Least recently used
+    encodings are removed if the memo is larger.
+
+    The memory of an entry is the size of its misc-encoding plus
+    MEMO_ENTRY_OVERHEAD, hence the memo holds fewer long encodings than short
+    ones.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Maximum memory in bytes.
+    """
+    global _memo_max_bytes
+    _memo_max_bytes = max_bytes
+    _memo_evict()
+
+
+def get_memo_stats():
+    """
+    Returns the number of hits, misses and evictions of the memo, its size and
+    its approximate memory in bytes.
+    """
+    return dict(_memo_stats, size=len(_memo), bytes=_memo_bytes)
+
+
+def clear_memo():
+    """
+    Removes all misc-encodings from the memo and resets its statistics.
+    """
+    global _memo_bytes
+    _memo.clear()
+    _memo_bytes = 0
+    for key in _memo_stats:
+        _memo_stats[key] = 0
+
+
+def _memo_evict():
+    """
+    Removes least recently used entries until the memo fits its size and memory.
+    """
+    global _memo_bytes
+    while _memo and (len(_memo) > _memo_size or _memo_bytes > _memo_max_bytes):
+        misc_encoding = _memo.popitem(last=False)[0]
+        _memo_bytes -= sys.getsizeof(misc_encoding) + MEMO_ENTRY_OVERHEAD
+        _memo_stats["evictions"] += 1
+
+
+def memo_lookup(misc_encoding, need_pattern=True):
+    """
+    Looks up a misc-encoding in the memo.
+
+    The distance and the first pattern only depend on the misc-encoding of a
+    permutation. find_pattern, encoding_distance and batch_distances therefore
+    remember them for recently searched encodings of at most MEMO_MAX_LENGTH
+    characters in a least recently used memo, which is bounded by the number
+    of entries and their memory. Like the distance table, an entry only stores
+    the index of the pattern in pattern_recipes(distance), and the subsequence
+    mapping is computed by recipe_mapping.
+
+    Parameters
+    ----------
+    misc_encoding: str
+        Misc-encoding of a permutation.
+    need_pattern: bool
+        If True, entries which only contain the distance count as misses.
+
+    Returns
+    -------
+    tuple
+        (distance, pattern index) or None for a miss. The pattern index is None
+        for entries which were stored by a distance-only search.
+    """
+    if _memo_size <= 0 or len(misc_encoding) > MEMO_MAX_LENGTH:
+        return None
+
+    entry = _memo.get(misc_encoding)
+
+    if entry is None or (need_pattern and entry[1] is None):
+        _memo_stats["misses"] += 1
+        return None
+
+    _memo.move_to_end(misc_encoding)
+    _memo_stats["hits"] += 1
+    return entry
+
+
+def memo_store(misc_encoding, dist, index=None):
+    """
+    Stores the distance, and optionally the index of the first pattern in
+    pattern_recipes(dist), of a misc-encoding in the memo, see memo_lookup.
+    """
+    global _memo_bytes
+    if _memo_size <= 0 or len(misc_encoding) > MEMO_MAX_LENGTH:
+        return
+
+    entry = _memo.get(misc_encoding)
+    if entry is not None:
+        _memo.move_to_end(misc_encoding)
+
+        # An entry with pattern is not replaced by a distance-only entry
+        if index is None or entry[1] is not None:
+            return
+    else:
+        _memo_bytes += sys.getsizeof(misc_encoding) + MEMO_ENTRY_OVERHEAD
+
+    _memo[misc_encoding] = (dist, index)
+    if _memo_journal is not None:
+        _memo_journal.append((misc_encoding, dist, index))
+    _memo_evict()
+
+
+@contextmanager
+def memo_journal():
+    """
+    Records the entries which are added to the memo within the context.
+
+    Worker processes use it to send the entries they computed back to the
+    parent process, which adds them to its own memo by memo_store.
+
+    Returns
+    -------
+    list
+        Contains (misc-encoding, distance, pattern index) of every new or
+        completed entry, in the order they were stored.
+    """
+    global _memo_journal
+    outer, _memo_journal = _memo_journal, []
+    try:
+        yield _memo_journal
+    finally:
+        _memo_journal = outer
+
+
+def get_memo_entries():
+    """
+    Returns all entries of the memo as a list of (misc-encoding, distance,
+    pattern index), in least recently used order. Entries can be added to the
+    memo of another process by memo_store.
+    """
+    return [(misc_encoding, dist, index) for misc_encoding, (dist, index) in _memo.items()]
+
+
+def save_memo(path):
+    """
+    Atomically writes the memo to a JSON file, see load_memo.
+    """
+    entries = []
+    for misc_encoding, dist, index in get_memo_entries():
+        if index is None:
+            entries.append([misc_encoding, dist])
+        else:
+            entries.append([misc_encoding, dist, index])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as tmpfile:
+        json.dump({"version": 2, "entries": entries}, tmpfile, separators=(",", ":"))
+    os.replace(tmpfile.name, path)
+
+
+def load_memo(path):
+    """
+    Adds the misc-encodings of a file written by save_memo to the memo. Does
+    nothing if the file does not exist. Files of the first version, which
+    contain the patterns and mappings, are read as distances only.
+    """
+    if not os.path.exists(path):
+        return
+
+    with open(path, "r") as infile:
+        entries = json.load(infile)["entries"]
+
+    for entry in entries:
+        if len(entry) == 3:
+            memo_store(entry[0], entry[1], entry[2])
+        else:
+            memo_store(entry[0], entry[1])
+
+
+def table_size(length):
+    """
+    Returns the number of entries of a distance table which contains all
+    misc-encodings of length 1, ..., length, i.e. 2^(length+1) - 2.
+    """
+    return 2 ** (length + 1) - 2
+
+
+def table_index(misc_encoding):
+    """
+    Returns the position of a misc-encoding in the distance table.
+
+    Encodings of length l start at 2^l - 2 and are ordered by their bit value,
+    in which bit i is set if the i-th misc-substring is negative, see
+    pack_encoding.
+    """
+    return 2 ** len(misc_encoding) - 2 + pack_encoding(misc_encoding)
+
+
+def get_distance_table():
+    """
+    Returns the path of the loaded distance table, or None.
+    """
+    return _table_path
+
+
+def load_distance_table(path):
+    """
+    Memory-maps a distance table created by table.py.
+
+    The table contains the distance and first pattern of every misc-encoding
+    up to some length, see table_index. find_pattern, encoding_distance and
+    batch_distances look up encodings of at most this length instead of
+    searching the patterns. The file is opened read-only, hence all processes
+    which load it share the same pages.
+
+    Parameters
+    ----------
+    path: str
+        Path of the .npy file, or None to unload the table.
+
+    Returns
+    -------
+    int
+        Maximum length of the misc-encodings in the table.
+    """
+    global _table, _table_path, _table_length
+    if path is None:
+        _table, _table_path, _table_length = None, None, 0
+        return 0
+
+    table = np.load(path, mmap_mode="r")
+    length = int(log2(len(table) + 2)) - 1
+    if table.dtype != TABLE_DTYPE or table.ndim != 1 or len(table) != table_size(length):
+        raise ValueError(path + " is not a distance table")
+
+    _table, _table_path, _table_length = table, path, length
+    return length
+
+
+def table_lookup(misc_encoding):
+    """
+    Returns the (distance, pattern index) of a misc-encoding from the distance
+    table, or None if no table is loaded or the encoding is too long.
+    """
+    if len(misc_encoding) > _table_length:
+        return None
+    entry = _table[table_index(misc_encoding)]
+    return int(entry["distance"]), int(entry["pattern"])
+
+
+def pack_encoding(misc_encoding):
+    """
+    Packs a misc-encoding, or pattern, into an integer in which bit i is set if
+    character i is n, i.e. p is 0 and n is 1.
+    """
+    return int(misc_encoding[::-1].translate(_PACK_TABLE), 2)
+
+
+def encoding_run_count(misc_encoding):
+    """
+    Returns the number of runs, i.e. maximal substrings of equal characters, of
+    a misc-encoding or pattern. subseq_mapping maps encodings with few runs by
+    run-length jumps, see _run_jumps.
+    """
+    return len(_RUN_REGEX.findall(misc_encoding))
+
+
+def get_patterns(k):
+    """
+    Computes all patterns of length 2^k.
+
+    The patterns are expanded from their implicit form, see pattern_recipes.
+    The pattern search works on the implicit form and does not call this
+    function; it is meant for code which needs the patterns as strings.
+
+    Parameters
+    ----------
+    k: int
+        Length of patterns to be calculated;
+        patterns of length 2^k are considered.
+
+    Returns
+    -------
+    list
+        Contains strings of all patterns of length 2^k. Is ordered by the
+        type of patterns, i.e. first the pattern that satisfies pattern Definition (i),
+        ... , then patterns that satisfy pattern Definition (iv).
+    """
+    return [expand_recipe(recipe) for recipe in pattern_recipes(k)]
+
+
+def pattern_recipes(k):
+    """
+    Returns all patterns of length 2^k in implicit form.
+
+    Every pattern consists of runs of equal length which alternate between p
+    and n: Definition (i) is a single run of p, Definitions (ii) and (iii) are
+    two runs of length 2^(k-1), and Definition (iv) repeats a pattern of length
+    2^(k-1) twice, which keeps its first character and run length. A pattern is
+    therefore given by its type, first character and run length, and the
+    recipes of length 2^k are computed in O(k) without expanding any pattern.
+
+    The only pattern of length 1 is p, i.e. Definition (i) for k = 0. Its only
+    misc-encoding is that of the identity, which therefore has distance 0.
+
+    Parameters
+    ----------
+    k: int
+        Length of patterns to be calculated;
+        patterns of length 2^k are considered.
+
+    Returns
+    -------
+    list
+        Contains the PatternRecipe of every pattern, in the order of get_patterns.
+    """
+    if k == 0:
+        return [PatternRecipe("TDRL", "p", 1, 0)]
+
+    # length of pattern, middle of pattern
+    l_full = 2 ** k
+    l_half = l_full // 2
+
+    # Pattern Definitions (i), (ii), (iii)
+    recipes = [PatternRecipe("TDRL", "p", l_full, k),
+               PatternRecipe("riTDRL", "p", l_half, k),
+               PatternRecipe("liTDRL", "n", l_half, k)]
+
+    # Pattern Definition (iv); patterns which start and end with p are an odd number of runs starting with p
+    for recipe in pattern_recipes(k - 1):
+        if recipe.first == "p" and (l_half // recipe.run_length) % 2 == 1:
+            continue
+        recipes.append(PatternRecipe("TDRL", recipe.first, recipe.run_length, k))
+
+    return recipes
+
+
+def expand_recipe(recipe):
+    """
+    Returns the pattern of a PatternRecipe as a tuple of type and string, as in
+    get_patterns.
+    """
+    other = "n" if recipe.first == "p" else "p"
+    runs = 2 ** recipe.k // recipe.run_length
+    if runs == 1:
+        return recipe.type, recipe.first * recipe.run_length
+
+    block = recipe.first * recipe.run_length + other * recipe.run_length
+    return recipe.type, block * (runs // 2)
+
+
+def encoding_run_lengths(misc_encoding):
+    """
+    Returns the lengths of the runs, i.e. maximal substrings of equal characters,
+    of a misc-encoding as an integer array.
+    """
+    chars = np.frombuffer(misc_encoding.encode("ascii"), dtype=np.uint8)
+    starts = np.flatnonzero(chars[1:] != chars[:-1]) + 1
+    return np.diff(np.concatenate(([0], starts, [len(chars)])))
+
+
+def _recipe_starts(recipe, misc_encoding, run_lengths):
+    """
+    Computes the run of a pattern in which the greedy subsequence mapping of
+    subseq_mapping starts to map each run of a misc-encoding.
+
+    A run of r characters which starts to be mapped at the beginning of a run of
+    the pattern occupies ceil(r / run_length) runs of its character, i.e. every
+    second run of the pattern. The next run of the misc-encoding has the other
+    character and starts at the following run of the pattern.
+
+    Returns
+    -------
+    tuple
+        (starts, used) where starts is the index of the run of the pattern in
+        which each run of the misc-encoding starts, and used is the number of
+        runs of the pattern up to the last mapped character. The misc-encoding
+        is subsequence of the pattern if used is at most 2^k / run_length.
+    """
+    h = recipe.run_length
+    steps = 2 * ((run_lengths + h - 1) // h) - 1
+    starts = np.cumsum(steps) - steps + (0 if misc_encoding[0] == recipe.first else 1)
+    return starts, int(starts[-1] + steps[-1])
+
+
+def recipe_subsequence(recipe, misc_encoding, run_lengths=None):
+    """
+    Tests whether a misc-encoding is subsequence of the pattern of a recipe,
+    without expanding the pattern, see _recipe_starts.
+
+    Parameters
+    ----------
+    recipe: PatternRecipe
+        Implicit pattern, see pattern_recipes.
+    misc_encoding: str
+        Misc-encoding of a permutation, see get_misc_encoding.
+    run_lengths: numpy.ndarray
+        Optional run lengths of misc_encoding, see encoding_run_lengths.
+
+    Returns
+    -------
+    bool
+        True if misc_encoding is subsequence of the pattern.
+    """
+    if run_lengths is None:
+        run_lengths = encoding_run_lengths(misc_encoding)
+
+    h = recipe.run_length
+    used = int(np.sum(2 * ((run_lengths + h - 1) // h) - 1)) + (0 if misc_encoding[0] == recipe.first else 1)
+    return used <= 2 ** recipe.k // h
+
+
+def recipe_mapping(recipe, misc_encoding, run_lengths=None):
+    """
+    Returns the subsequence mapping of subseq_mapping between a misc-encoding
+    and the pattern of a recipe, without expanding the pattern.
+
+    Character t of a run of the misc-encoding which starts in run s of the
+    pattern is mapped to position (s + 2 * (t // run_length)) * run_length
+    + t % run_length, computed for all characters at once.
+
+    Returns
+    -------
+    dict
+        Dict which maps positions in the pattern to the misc-decomposition, or
+        an empty dict if the misc-encoding is not subsequence of the pattern.
+    """
+    if run_lengths is None:
+        run_lengths = encoding_run_lengths(misc_encoding)
+
+    h = recipe.run_length
+    starts, used = _recipe_starts(recipe, misc_encoding, run_lengths)
+    if used > 2 ** recipe.k // h:
+        return {}
+
+    # Offset t of every character within its run of the misc-encoding
+    run_of_char = np.repeat(np.arange(len(run_lengths)), run_lengths)
+    offsets = np.arange(len(misc_encoding)) - (np.cumsum(run_lengths) - run_lengths)[run_of_char]
+    positions = (starts[run_of_char] + 2 * (offsets // h)) * h + offsets % h
+
+    # Every character of pattern up to the last mapped one was compared once
+    if _profile is not None:
+        _profile_count("subseq_comparisons", int(positions[-1]) + 1)
+
+    return dict(zip(positions.tolist(), range(len(misc_encoding))))
+
+
+def subseq_mapping(misc_dec, pattern):
+    """
+    Returns a subsequence mapping between a misc-decomposition and a pattern.
+
+    This function implements a greedy approach to acquire a subsequence mapping
+    between a misc-decomposition, or misc-encoding, and a pattern. Returns an
+    empty dictionary if no such mapping exists.
+
+    Parameters
+    ----------
+    misc_dec: list
+        List of tuples which correspond to the misc-substrings of a permutation.
+        It is expected that the first value of each tuple contains the corresponding
+        character of a permutations misc-encoding, i.e. p/n. Tuples encoding the
+        misc-substrings of a permutation have to be ordered by their occurrence
+        in the permutation.
+    pattern:
+        String representing a pattern.
+
+    Returns
+    -------
+    dict
+        Dict which maps characters in the pattern to the misc-decomposition. When
+        no mapping can be found, i.e. the misc-encoding is not subsequence of
+        pattern, an empty dictionary is returned.
+    """
+    misc_encoding = "".join([_[0] for _ in misc_dec])
+    if encoding_run_count(misc_encoding) <= RUN_JUMP_RATIO * len(pattern):
+        mapping = {}
+        last_index_pattern = _run_jumps(misc_encoding, pattern, mapping)
+        if last_index_pattern == -1:
+            if _profile is not None:
+                _profile_count("subseq_comparisons", _subseq_comparisons(misc_dec, pattern))
+            return {}
+        if _profile is not None:
+            _profile_count("subseq_comparisons", last_index_pattern)
+        return mapping
+
+    mapping = {}
+
+    # Index of last seen character in pattern
+    last_index_pattern = 0
+
+    # Pass over misc_dec once and search for the next matching character in pattern
+    for i in range(0, len(misc_dec)):
+
+        # Iteration starts from the last checked character in pattern.
+        for j in range(last_index_pattern, len(pattern)):
+            if misc_dec[i][0] == pattern[j]:
+                mapping[j] = i
+                last_index_pattern = j + 1
+                break
+
+    # Check if subsequence mapping is incomplete, i.e. misc_dec is not
+    # subsequence of pattern.
+    if len(mapping) != len(misc_dec):
+        if _profile is not None:
+            _profile_count("subseq_comparisons", _subseq_comparisons(misc_dec, pattern))
+        return {}
+
+    # Every character of pattern up to the last mapped one was compared once
+    if _profile is not None:
+        _profile_count("subseq_comparisons", last_index_pattern)
+
+    return mapping
+
+
+def _subseq_comparisons(misc_dec, pattern):
+    """
+    Returns the number of character comparisons of subseq_mapping for a
+    misc-decomposition which is not subsequence of pattern.
+    """
+    comparisons = 0
+    last_index_pattern = 0
+    for misc in misc_dec:
+        j = pattern.find(misc[0], last_index_pattern)
+        if j == -1:
+            comparisons += len(pattern) - last_index_pattern
+        else:
+            comparisons += j - last_index_pattern + 1
+            last_index_pattern = j + 1
+    return comparisons
+
+
+def _run_jumps(misc_encoding, pattern, mapping=None):
+    """
+    Greedy subsequence mapping of subseq_mapping by run-length jumps.
+
+    Every run of the misc-encoding is mapped at once: str.find jumps to the next
+    occurrence of its character in the pattern, and the run is mapped into the
+    run of the pattern which starts there, up to the end of either run. Only one
+    step per run is executed in Python.
+
+    Returns
+    -------
+    int
+        Position after the last mapped character of the pattern, or -1 if the
+        misc-encoding is not subsequence of the pattern. The mapping is added to
+        the dict mapping, if given.
+    """
+    pos = 0
+    for run in _RUN_REGEX.finditer(misc_encoding):
+        i, end = run.span()
+        c = misc_encoding[i]
+        other = "n" if c == "p" else "p"
+
+        while i < end:
+            start = pos = pattern.find(c, pos)
+            if pos == -1:
+                return -1
+
+            run_end = pattern.find(other, pos)
+            if run_end == -1:
+                run_end = len(pattern)
+
+            pos = min(run_end, start + end - i)
+            if mapping is not None:
+                mapping.update(zip(range(start, pos), range(i, i + pos - start)))
+            i += pos - start
+
+    return pos
+
+
+def oplus_into(misc_1, misc_2, out, pos):
+    """
+    Merges misc_1 and misc_2 into a preallocated output buffer.
+
+    Like oplus, but the merged misc-substring is written to
+    out[pos:pos + len(misc_1) + len(misc_2)]. The merge is done by sorted(),
+    whose merge sort detects misc_1 and misc_2 as ascending runs and merges them
+    in linear time.
+
+    Parameters
+    ----------
+    misc_1: list
+        First misc-substring
+    misc_2: list
+        Second misc-substring
+    out: list
+        Output buffer which is large enough to hold the merged misc-substring
+        at pos. May also be a memoryview of a Permutation.
+    pos: int
+        Position in out at which the merged misc-substring starts.
+
+    Returns
+    -------
+    int
+        Position in out after the merged misc-substring.
+    """
+    return _write(out, pos, sorted(chain(misc_1, misc_2)))
+
+
+def oplus(misc_1, misc_2):
+    """
+    Implements the merge and lexicographically sort function
+
+    This function merges misc_1 and misc_2 such that the resulting string is
+    ordered ascendingly, and misc_1 and misc_2 are subsequences of the output
+    string. Take note that misc_1 and misc_2 have to be misc-substrings in order
+    for the output string to be a misc-substring.
+
+    Parameters
+    ----------
+    misc_1: list
+        First misc-substrings
+    misc_2: list
+        Second misc-substring
+    Returns
+    -------
+    list
+        merged misc-substring which is ordered ascendingly and contains all
+        elements from misc_1 and misc_2
+    """
+    merge_misc = [0] * (len(misc_1) + len(misc_2))
+    oplus_into(misc_1, misc_2, merge_misc, 0)
+    return merge_misc
+
+
+def inverse(perm):
+    """
+    Implements the inversion of a permutations.
+
+
+    Parameters
+    ----------
+    perm: list
+        List of integers which represents a string of integers, or a permutation
+
+    Returns
+    -------
+    list
+        Inverse of perm. A Permutation if perm is a Permutation.
+    """
+    if isinstance(perm, Permutation):
+        elements = perm.to_numpy()
+        inv_perm = np.empty(len(elements), dtype=np.intc)
+        positions = np.arange(1, len(elements) + 1, dtype=np.intc)
+        inv_perm[np.abs(elements) - 1] = np.where(elements > 0, positions, -positions)
+        return Permutation(inv_perm.tobytes())
+
+    inv_perm = [0 for _ in perm]
+
+    for x in range(0, len(perm)):
+        if(perm[x]>0):
+            inv_perm[perm[x] - 1] = x + 1
+        else:
+            inv_perm[-perm[x] - 1] = -x - 1
+    return inv_perm
+
+
+def composition(p1, p2):
+    """
+    Implements the composition of two permutations.
+
+
+    Parameters
+    ----------
+    p1: list
+        List of integers which represents a string of integers, or a permutation
+    p2: list
+        List of integers which represents a string of integers, or a permutation
+
+    Returns
+    -------
+    list
+        Composition of p1 * p2. A Permutation if p1 or p2 is a Permutation.
+    """
+    if isinstance(p1, Permutation) or isinstance(p2, Permutation):
+        elements_1 = np.asarray(p1, dtype=np.intc)
+        elements_2 = np.asarray(p2, dtype=np.intc)
+        comp_perm = elements_1[np.abs(elements_2) - 1]
+        comp_perm[elements_2 < 0] *= -1
+        return Permutation(comp_perm.tobytes())
+
+    comp_perm = [0 for _ in p1]
+    for x in range(0, len(p2)):
+        if 0 < p2[x]:
+            comp_perm[x] = p1[p2[x] - 1]
+        else:
+            comp_perm[x] = -p1[-p2[x] - 1]
+    return comp_perm
+
+
+def reverse(permutation):
+    """
+    Implements the reversion operation (for permutations or strings of integers)
+
+    Returns the input list in reversed order, and with the signage of every
+    element switched (i.e. + -> - ; - -> +). Input strings have to be represented
+    by a list
+
+    Parameters
+    ----------
+    permutation: list
+        List of integers which represents a string of integers, or a permutation
+
+    Returns
+    -------
+    list
+        List in which the order and signage of the input list is reversed.
+        A Permutation if permutation is a Permutation.
+    """
+    if isinstance(permutation, Permutation):
+        return Permutation((-permutation.to_numpy()[::-1]).tobytes())
+
+    return [-x for x in reversed(permutation)]
+
+
+def stringify(permutation):
+    """
+    Returns a string representation for a list (of integers, or any datatype
+    which possesses a str() representation)
+
+    Every element in the returned string is separated by a space.
+
+    Parameters
+    ----------
+    permutation: list
+        List which should be stringifies, i.e., which shall be represented
+        as a space-separated string.
+
+    Returns
+    -------
+    str
+        String representation of l.
+    """
+    return "".join([str(x) + " " for x in permutation])
+
+
+def _misc_substring(permutation, misc_dec, misc_mapping, index, reversed_misc):
+    """
+    Returns the misc-substring which is mapped to character index of a pattern,
+    reversed if reversed_misc is set, or an empty list if no misc-substring is
+    mapped to this character. For a Permutation, the misc-substring is a
+    memoryview into permutation unless it is reversed.
+    """
+    try:
+        misc = misc_dec[misc_mapping[index]]
+    except KeyError:
+        return []
+
+    if isinstance(permutation, Permutation):
+        substring = memoryview(permutation)[misc[1]:misc[2]]
+    else:
+        substring = permutation[misc[1]:misc[2]]
+
+    if reversed_misc:
+        return reverse(substring)
+    return substring
+
+
+def _merge_misc_spans(permutation, spans):
+    """
+    Computes the misc-decomposition of a permutation which is a concatenation of
+    ascending, equally signed runs, given by their (start, end) spans.
+
+    Adjacent runs belong to the same misc-substring unless there is a descent, or
+    a change of sign, at their common border. Hence only the borders of the runs
+    are inspected instead of every element. Returns None if a run contains both
+    signs, i.e. is not a misc-substring itself.
+    """
+    misc_dec = []
+    for start, end in spans:
+        first = permutation[start]
+        last = permutation[end - 1]
+        if (first > 0) != (last > 0):
+            return None
+
+        # Extend the last misc-substring if the run continues it
+        if misc_dec and last_element < first and (last_element > 0) == (first > 0):
+            misc_dec[-1] = (misc_dec[-1][0], misc_dec[-1][1], end)
+        else:
+            misc_dec.append(("p" if first > 0 else "n", start, end))
+        last_element = last
+
+    return misc_dec
+
+
+def _write(buffer, pos, values):
+    """
+    Writes values to buffer[pos:pos + len(values)] and returns the position
+    after the written values. Lists are converted for memoryview buffers.
+    """
+    end = pos + len(values)
+    if pos != end:
+        if isinstance(buffer, memoryview) and isinstance(values, list):
+            values = array("i", values)
+        buffer[pos:end] = values
+    return end
+
+
+# noinspection PyPep8Naming
+def transformation(permutation, pattern, misc_dec, misc_mapping):
+    """
+    Implements transformation T.
+
+    This function implements the transformation T and decides which case of the
+    Definition of the transformation should be invoked depending on the pattern
+    supplied. A tuple containing all relevant information of the permutation
+    which is obtained after applying T is returned.
+
+    The permutation after T, L and R are written to buffers which are allocated
+    once, and the taus are merged into place by oplus_into.
+
+    Parameters
+    ----------
+    permutation: list
+        List representation of a permutation of the elements [1:n] which contains
+        every element exactly once.
+    pattern: tuple
+        A tuple that contains the type of pattern, i.e.
+        - TDRL for patterns satisfying pattern Definition (i) or (iv)
+        - riTDRL for patterns satisfying pattern Definition (ii)
+        - liTDRL for patterns satisfying pattern Definition (iii)
+        and the string that represents the pattern.
+    misc_dec: list
+        A List of tuples that represent the misc-decomposition and misc-encoding of
+        permutation. Can be acquired via get_misc_dec(permutation).
+    misc_mapping:
+        Dictionary which maps each character in pattern[1] to a character in the
+        misc-encoding of permutation.
+    Returns
+    -------
+    tuple
+        Tuple which represents the permutation after the application of T.
+        Additional information like the next pattern, and the TDRL/iTDRL which
+        inverts T is included as well. The tuple has the shape
+        (permutation_after_T, nextpattern, TDRL/iTDRL, L, R, misc_dec_after_T).
+        permutation_after_T is the permutation after the application of T.
+        nextpattern is the pattern the misc-dec of permutation_after_T is subsequence of.
+        TDRL/iTDRL is a string which encodes the operation which reverses T, i.e.
+        "TDRL", "liTDRL", or "riTDRL"
+        L, R is the exact bipartition for TDRL/iTDRL which, applied to the
+        permutation_after_T yields the input permutation. Both are lists of integers.
+        For a Permutation, permutation_after_T, L and R are Permutations.
+        misc_dec_after_T is the misc-decomposition of permutation_after_T, see
+        get_misc_dec. It is derived from the borders of the taus, each of which
+        is an ascending misc-substring, instead of rescanning the permutation.
+    """
+
+    # Stores the length, and the middle of pattern
+    l_full = len(pattern[1])
+    l_half = int(l_full / 2)
+
+    # For each tau, the characters of pattern whose misc-substrings are merged,
+    # and whether these misc-substrings are reversed.
+    # T is reversible by a TDRL, or is the inverse of a TDRL
+    if pattern[0] == "TDRL":
+
+        # Derive pattern T(permutation,pattern) is subsequence of.
+        # For TDRL, this is the first half of the input pattern
+        newpat = pattern[1][0:l_half]
+        pairs = [(i, False, l_half + i, False) for i in range(0, l_half)]
+
+    # T is reversible by an liTDRL, hence is the inverse of an liTDRL
+    elif pattern[0] == "liTDRL":
+
+        # Derive pattern T(permutation,pattern) is subsequence of.
+        # For liTDRL this is the last half of the pattern.
+        # According to the definition of T, misc_1 is reversed.
+        newpat = pattern[1][l_half:l_full]
+        pairs = [(l_half - i - 1, True, l_half + i, False) for i in range(0, l_half)]
+
+    # T is reversible by an riTDRL, hence is the inverse of an riTDRL
+    elif pattern[0] == "riTDRL":
+
+        # Derive pattern T(permutation,pattern) is subsequence of.
+        # For riTDRL, this is the first half of the input pattern
+        # According to the definition of T, misc_2 is reversed.
+        newpat = pattern[1][0:l_half]
+        pairs = [(i, False, l_full - i - 1, True) for i in range(0, l_half)]
+
+    else:
+        return [], "", pattern[0], [], [], []
+
+    compact = isinstance(permutation, Permutation)
+
+    # Contains the permutation after application of T
+    if compact:
+        taus = Permutation(bytes(len(permutation) * permutation.itemsize))
+    else:
+        taus = [0] * len(permutation)
+    tau_pos = 0
+
+    # L receives every misc-substring mapped to the left half of the pairs
+    l_len = 0
+    for left, reversed_left, right, reversed_right in pairs:
+        if left in misc_mapping:
+            misc = misc_dec[misc_mapping[left]]
+            l_len += misc[2] - misc[1]
+
+    if compact:
+        L = Permutation(bytes(l_len * permutation.itemsize))
+        R = Permutation(bytes((len(permutation) - l_len) * permutation.itemsize))
+    else:
+        L = [0] * l_len
+        R = [0] * (len(permutation) - l_len)
+    l_pos = 0
+    r_pos = 0
+
+    # Permutations are written through memoryviews
+    if compact:
+        taus_buffer, l_buffer, r_buffer = memoryview(taus), memoryview(L), memoryview(R)
+    else:
+        taus_buffer, l_buffer, r_buffer = taus, L, R
+
+    # Spans of the non-empty taus in the output permutation
+    spans = []
+
+    # The taus are sequentially created in this loop and merged into the
+    # output permutation.
+    for left, reversed_left, right, reversed_right in pairs:
+        misc_1 = _misc_substring(permutation, misc_dec, misc_mapping, left, reversed_left)
+        misc_2 = _misc_substring(permutation, misc_dec, misc_mapping, right, reversed_right)
+
+        # L and R are created sequentially.
+        l_pos = _write(l_buffer, l_pos, misc_1)
+        r_pos = _write(r_buffer, r_pos, misc_2)
+
+        # The sorted misc-substrings are merged into the output permutation.
+        tau_start = tau_pos
+        tau_pos = oplus_into(misc_1, misc_2, taus_buffer, tau_pos)
+        if tau_pos != tau_start:
+            spans.append((tau_start, tau_pos))
+
+    if compact:
+        taus_buffer.release()
+        l_buffer.release()
+        r_buffer.release()
+
+    if _profile is not None:
+        _profile_count("oplus_calls", len(pairs))
+        _profile_count("oplus_elements", tau_pos)
+        _profile_count("buffer_elements", len(taus) + len(L) + len(R))
+
+    # The misc-decomposition of the output only changes at the borders of the taus.
+    # Falls back to a full scan if a tau is not a misc-substring.
+    new_misc_dec = _merge_misc_spans(taus, spans)
+    if new_misc_dec is None:
+        new_misc_dec = get_misc_dec(taus)
+    elif compact:
+        taus._misc_dec = new_misc_dec
+
+    return taus, newpat, pattern[0], L, R, new_misc_dec
+
+
+def apply_operation(operation, L, R):
+    """
+    Applies a TDRL/iTDRL to the permutation which is bipartitioned into L and R.
+
+    L and R are the subsequences of the permutation which remain in the left,
+    and in the right copy, as reported by transformation. The copy of an iTDRL
+    which is reversed is inverted, i.e. its order and signage are reversed.
+
+    Parameters
+    ----------
+    operation: str
+        "TDRL", "riTDRL" or "liTDRL".
+    L: list
+        Elements which remain in the left copy.
+    R: list
+        Elements which remain in the right copy.
+
+    Returns
+    -------
+    list
+        L + R for a TDRL, L + reverse(R) for an riTDRL, and reverse(L) + R for an
+        liTDRL.
+    """
+    if operation == "TDRL":
+        return list(L) + list(R)
+    if operation == "riTDRL":
+        return list(L) + reverse(list(R))
+    if operation == "liTDRL":
+        return reverse(list(L)) + list(R)
+    raise ValueError("unknown operation " + str(operation))
+
 
-    # adjust last index for easier slicing in transformation
-    misc_dec[-1] = (misc_dec[-1][0], misc_dec[-1][1], misc_dec[-1][2] + 1)
+def pattern_type(pattern):
+    """
+    Derives the type of a pattern from its characters.
 
-    return misc_dec
+    The type is decided by examining the characters at the beginning, the
+    middle, and the end of the pattern.
 
+    Parameters
+    ----------
+    pattern: str
+        String that represents a pattern.
 
-def get_patterns(k):
+    Returns
+    -------
+    str
+        "liTDRL" for patterns satisfying pattern Definition (iii), "riTDRL" for
+        patterns satisfying pattern Definition (ii), "TDRL" otherwise.
     """
-    Computes all patterns of length 2^k.
+    first = pattern[0]
+    last = pattern[-1]
+    mid = pattern[int(len(pattern) / 2)]
+
+    if first == "n" and last == "p" and mid == "p":
+        return "liTDRL"
+    elif first == "p" and last == "n" and mid == "n":
+        return "riTDRL"
+    return "TDRL"
+
 
-    Checks whether a file containing patterns of length 2^k exist, and if it
-    doesn't, computes all patterns up to length 2^k. A list containing all
-    patterns length 2^k is returned.
+def find_pattern(misc_dec):
+    """
+    Finds the first pattern, and thereby the distance, of a misc-decomposition.
+
+    Follows Algorithm 1, i.e. the patterns of length 2^k with
+    k = ceil(log2(#miscs)) are searched first, and the patterns of length
+    2^(k+1) only if none of them matches.
 
     Parameters
     ----------
-    k: int
-        Length of patterns to be calculated;
-        patterns of length 2^k are considered.
+    misc_dec: list
+        A List of tuples that represent the misc-decomposition and misc-encoding of
+        a permutation. Can be acquired via get_misc_dec(permutation).
 
     Returns
     -------
-    list
-        Contains strings of all patterns of length 2^k. Is ordered by the
-        type of patterns, i.e. first the pattern that satisfies pattern Definition (i),
-        ... , then patterns that satisfy pattern Definition (iv).
+    tuple
+        (distance, pattern, mapping) where pattern is the first pattern in the order
+        of get_patterns the misc-encoding is subsequence of, and mapping is the
+        corresponding subsequence mapping. Patterns are looked up in the distance
+        table if it contains the misc-encoding, see load_distance_table, and
+        results are memoized by misc-encoding, see memo_lookup.
     """
+    misc_encoding = "".join([_[0] for _ in misc_dec])
+    run_lengths = None
+
+    entry = table_lookup(misc_encoding)
+    if entry is not None and entry[1] == TABLE_NO_PATTERN:
+        entry = None
+    if entry is None:
+        entry = memo_lookup(misc_encoding)
+    if entry is None:
+        run_lengths = encoding_run_lengths(misc_encoding)
+        entry = _search_pattern(misc_encoding, run_lengths)
+        if entry[1] is not None:
+            memo_store(misc_encoding, entry[0], entry[1])
+
+    dist, index = entry
+    if index is None:
+        return dist, "", {}
+
+    # Only the first matching pattern is expanded
+    recipe = pattern_recipes(dist)[index]
+    return dist, expand_recipe(recipe), recipe_mapping(recipe, misc_encoding, run_lengths)
+
+
+def _search_pattern(misc_encoding, run_lengths):
+    """
+    Searches the first pattern of a misc-encoding, see find_pattern.
 
-    # TODO: RECURSIVELY GENERATE PATTERNS FOR k-1,...,1 IF PATTERNS FOR k ARE
-    # NOT AVAILABLE. --> GENERATE FILES FOR MISSING PATTERNS
-    if k == 0:
-        return []
+    The patterns are tested in implicit form, see pattern_recipes.
 
-    # Test whether a file containing all patterns of length 2^k exists
-    try:
-        with open("pattern_" + str(k) + ".txt", "r") as patfile:
-            patterns = json.load(patfile)
-            return patterns
-    except FileNotFoundError:
-        print("Patterns for k=" + str(k) + " not available.")
-        print("Pattern file pattern_" + str(k) + " will be created.")
+    Returns
+    -------
+    tuple
+        (distance, index) where index is the index of the first pattern in
+        pattern_recipes(distance), or None if no pattern matches.
+    """
+    k = ceil(log2(len(misc_encoding)))
 
-    patterns = {}
+    # for the case that d(identity,permutation) is k, and for the case that it is k+1
+    tried = 0
+    for dist in (k, k + 1):
+        for index, recipe in enumerate(pattern_recipes(dist)):
+            tried += 1
+            if recipe_subsequence(recipe, misc_encoding, run_lengths):
+                if _profile is not None:
+                    _profile_count("patterns_tried", tried)
+                return dist, index
 
-    # Generate all patterns up to length 2^k
-    for i in range(1, k + 1):
+    if _profile is not None:
+        _profile_count("patterns_tried", tried)
+    return k + 1, None
 
-        patterns[i] = []
 
-        # length of pattern, middle of pattern
-        l_full = 2 ** i
-        l_half = int(l_full / 2)
+def encoding_distance(misc_encoding):
+    """
+    Computes the TDRL/iTDRL distance from a misc-encoding.
 
-        pos, negpos, posneg, reppat = "", "", "", ""
+    Like find_pattern, but the search stops at the first pattern the misc-encoding
+    is subsequence of without creating a subsequence mapping.
 
-        # Pattern Definition (i)
-        pos = pos.join(["p" for _ in range(0, l_full)])
+    Parameters
+    ----------
+    misc_encoding: str
+        Misc-encoding of a permutation, see get_misc_encoding.
 
-        # Pattern Definition (iii)
-        negpos += "".join(["n" for _ in range(0, l_half)])
-        negpos += "".join(["p" for _ in range(0, l_half)])
+    Returns
+    -------
+    int
+        TDRL/iTDRL distance of every permutation with this misc-encoding.
+    """
+    if len(misc_encoding) <= _table_length:
+        return int(_table["distance"][table_index(misc_encoding)])
 
-        # Pattern Definition (ii)
-        posneg += "".join(["p" for _ in range(0, l_half)])
-        posneg += "".join(["n" for _ in range(0, l_half)])
+    entry = memo_lookup(misc_encoding, need_pattern=False)
+    if entry is not None:
+        return entry[0]
 
-        patterns[i] += [("TDRL", pos), ("riTDRL", posneg), ("liTDRL", negpos)]
+    k = ceil(log2(len(misc_encoding)))
 
-        # Pattern Definition (iv)
-        if i == 1:
-            continue
-        else:
-            for pat in patterns[i - 1]:
-                if pat[1][0] == "p" and pat[1][-1] == "p":
-                    continue
-                reppat += pat[1]
-                reppat += pat[1]
-                patterns[i] += [("TDRL", reppat)]
-                reppat = ""
+    run_lengths = encoding_run_lengths(misc_encoding)
 
-    # Save patterns of length 2^k to file pattern_k.txt
-    with open("pattern_" + str(k) + ".txt", "w+") as patfile:
-        json.dump(patterns[k], patfile)
+    dist = k + 1
+    tried = 0
+    for recipe in pattern_recipes(k):
+        tried += 1
+        if recipe_subsequence(recipe, misc_encoding, run_lengths):
+            dist = k
+            break
 
-    return patterns[k]
+    if _profile is not None:
+        _profile_count("patterns_tried", tried)
 
+    memo_store(misc_encoding, dist)
+    return dist
 
-def subseq_mapping(misc_dec, pattern):
-    """
-    Returns a subsequence mapping between a misc-decomposition and a pattern.
 
-    This function implements a greedy approach to acquire a subsequence mapping
-    between a misc-decomposition, or misc-encoding, and a pattern. Returns an
-    empty dictionary if no such mapping exists.
+def distance(permutation, identity=None):
+    """
+    Computes the TDRL/iTDRL distance of a permutation.
 
     Parameters
     ----------
-    misc_dec: list
-        List of tuples which correspond to the misc-substrings of a permutation.
-        It is expected that the first value of each tuple contains the corresponding
-        character of a permutations misc-encoding, i.e. p/n. Tuples encoding the
-        misc-substrings of a permutation have to be ordered by their occurrence
-        in the permutation.
-    pattern:
-        String representing a pattern.
+    permutation: list
+        List of n potentially negative elements where
+        every element occurs exactly once
+    identity: list
+        Optional permutation which is sorted into permutation instead of the
+        identity permutation.
 
     Returns
     -------
-    dict
-        Dict which maps characters in the pattern to the misc-decomposition. When
-        no mapping can be found, i.e. the misc-encoding is not subsequence of
-        pattern, an empty dictionary is returned.
+    int
+        Number of TDRL/iTDRL which are necessary and sufficient to sort the
+        identity permutation (or identity, if given) into permutation.
     """
-    mapping = {}
+    if identity is not None:
+        permutation = composition(inverse(identity), permutation)
 
-    # Index of last seen character in pattern
-    last_index_pattern = 0
+    if _profile is None:
+        return encoding_distance(get_misc_encoding(permutation))
 
-    # Pass over misc_dec once and search for the next matching character in pattern
-    for i in range(0, len(misc_dec)):
+    _profile_start()
+    misc_encoding = get_misc_encoding(permutation)
+    _profile_stop("misc_decomposition")
 
-        # Iteration starts from the last checked character in pattern.
-        for j in range(last_index_pattern, len(pattern)):
-            if misc_dec[i][0] == pattern[j]:
-                mapping[j] = i
-                last_index_pattern = j + 1
-                break
+    _profile_start()
+    dist = encoding_distance(misc_encoding)
+    _profile_stop("pattern_search")
+    return dist
 
-    # Check if subsequence mapping is incomplete, i.e. misc_dec is not
-    # subsequence of pattern.
-    if len(mapping) != len(misc_dec):
-        return {}
 
-    return mapping
+def _batch_borders(permutations):
+    """
+    Returns a boolean matrix which is True at the first element of every
+    misc-substring, and a boolean matrix which is True for negative elements.
+    """
+    negative = permutations < 0
 
+    # The first element of every row, descents, and changes of sign start a misc
+    border = np.ones(permutations.shape, dtype=bool)
+    border[:, 1:] = (permutations[:, :-1] > permutations[:, 1:]) | (negative[:, :-1] != negative[:, 1:])
 
-def oplus(misc_1, misc_2):
+    return border, negative
+
+
+def batch_misc_encodings(permutations):
     """
-    Implements the merge and lexicographically sort function
+    Computes the misc-encodings of many permutations of the same length at once.
 
-    This function merges misc_1 and misc_2 such that the resulting string is
-    ordered ascendingly, and misc_1 and misc_2 are subsequences of the output
-    string. Take note that misc_1 and misc_2 have to be misc-substrings in order
-    for the output string to be a misc-substring.
+    The borders of the misc-substrings are found by one vectorized pass over the
+    whole matrix, see misc_boundaries.
 
     Parameters
     ----------
-    misc_1: list
-        First misc-substrings
-    misc_2: list
-        Second misc-substring
+    permutations: numpy.ndarray
+        (m x n) integer array, each row contains one permutation.
+
     Returns
     -------
     list
-        merged misc-substring which is ordered ascendingly and contains all
-        elements from misc_1 and misc_2
+        Misc-encodings of the m rows.
     """
+    border, negative = _batch_borders(np.asarray(permutations))
 
-    merge_misc = []
-
-    # Stores the current position in misc_1 and misc_2
-    index_1 = 0
-    index_2 = 0
+    # Characters of all misc-substrings, ordered by row
+    chars = np.where(negative[border], ord("n"), ord("p")).astype(np.uint8).tobytes().decode("ascii")
+    ends = np.cumsum(np.count_nonzero(border, axis=1)).tolist()
 
-    # Merges misc_1 and misc_2 similarly to the mergesort merge.
-    while len(merge_misc) != len(misc_1) + len(misc_2):
+    return [chars[start:end] for start, end in zip([0] + ends[:-1], ends)]
 
-        # End of misc_1 reached.
-        if index_1 >= len(misc_1):
-            merge_misc += [misc_2[index_2]]
-            index_2 += 1
 
-        # End of misc_2 reached.
-        elif index_2 >= len(misc_2):
-            merge_misc += [misc_1[index_1]]
-            index_1 += 1
+def batch_runs(negative, offsets):
+    """
+    Computes the runs, i.e. maximal substrings of equal characters, of many
+    misc-encodings which are stored one after another.
 
-        # Next element is in misc_1
-        elif misc_1[index_1] < misc_2[index_2]:
-            merge_misc += [misc_1[index_1]]
-            index_1 += 1
+    Parameters
+    ----------
+    negative: numpy.ndarray
+        Boolean array which is True for every n of the concatenated
+        misc-encodings.
+    offsets: numpy.ndarray
+        Position of the first character of every misc-encoding in negative.
+        Every misc-encoding contains at least one character.
 
-        # Last case - next element is in misc_2
-        else:
-            merge_misc += [misc_2[index_2]]
-            index_2 += 1
+    Returns
+    -------
+    tuple
+        (run_lengths, run_offsets) where run_lengths contains the lengths of
+        the runs of all misc-encodings one after another, and run_offsets the
+        position of the first run of every misc-encoding in run_lengths.
+    """
+    starts = np.ones(len(negative), dtype=bool)
+    starts[1:] = negative[1:] != negative[:-1]
+    starts[offsets] = True
 
-    return merge_misc
+    run_starts = np.flatnonzero(starts)
+    run_lengths = np.diff(run_starts, append=len(negative)).astype(np.int32)
+    return run_lengths, np.searchsorted(run_starts, offsets)
 
 
-def inverse(perm):
+def select_runs(run_lengths, run_offsets, rows):
     """
-    Implements the inversion of a permutations.
+    Returns the runs of the misc-encodings selected by the boolean array rows,
+    see batch_runs.
+    """
+    counts = np.diff(run_offsets, append=len(run_lengths))
+    counts_selected = counts[rows]
+    return run_lengths[np.repeat(rows, counts)], np.cumsum(counts_selected) - counts_selected
 
 
+def first_patterns(run_lengths, run_offsets, first_n, recipes):
+    """
+    Searches the first pattern for many misc-encodings at once.
+
+    The number of runs of a pattern used by the greedy subsequence mapping, see
+    _recipe_starts, only depends on the run length h of the pattern. A run of r
+    characters uses 2 * ceil(r / h) - 1 runs, i.e. one run plus 2 * (ceil(r / h) - 1)
+    for the runs longer than h. Runs longer than h are also longer than every
+    smaller run length, hence the long runs are filtered once per run length
+    of the recipes, in increasing order, and summed for all misc-encodings at
+    once.
 
     Parameters
     ----------
-    perm: list
-        List of integers which represents a string of integers, or a permutation
+    run_lengths, run_offsets: numpy.ndarray
+        Runs of the misc-encodings, see batch_runs.
+    first_n: numpy.ndarray
+        Boolean array which is True for misc-encodings starting with n.
+    recipes: list
+        Patterns in implicit form, see pattern_recipes.
 
     Returns
     -------
-    list
-        Inverse of perm.
+    numpy.ndarray
+        Index of the first pattern every misc-encoding is subsequence of, or -1.
     """
-    inv_perm = [0 for _ in perm]
+    m = len(run_offsets)
+    counts = np.diff(run_offsets, append=len(run_lengths))
 
-    for x in range(0, len(perm)):
-        if(perm[x]>0):
-            inv_perm[perm[x] - 1] = x + 1
-        else:
-            inv_perm[-perm[x] - 1] = -x - 1
-    return inv_perm
+    # Long runs and the misc-encodings they belong to
+    long_runs = run_lengths
+    long_rows = np.repeat(np.arange(m), counts)
 
+    used_by_length = {}
+    for h in sorted(set(recipe.run_length for recipe in recipes)):
+        long = long_runs > h
+        long_runs, long_rows = long_runs[long], long_rows[long]
 
-def composition(p1, p2):
-    """
-    Implements the composition of two permutations.
+        # Run lengths of patterns are powers of two, hence ceil(r / h) is a shift
+        shift = h.bit_length() - 1
+        extra = 2 * (((long_runs + (h - 1)) >> shift) - 1)
+        used_by_length[h] = counts + np.bincount(long_rows, weights=extra, minlength=m).astype(np.int64)
+
+    first = np.full(m, -1, dtype=np.int64)
+    for index, recipe in enumerate(recipes):
+        h = recipe.run_length
+        used = used_by_length[h] + (first_n != (recipe.first == "n"))
+        matched = (first == -1) & (used <= 2 ** recipe.k // h)
+        first[matched] = index
 
+    return first
 
 
+def batch_distances(permutations):
+    """
+    Computes the TDRL/iTDRL distances of many permutations of the same length.
+
+    The misc-encodings of all rows are computed at once, see batch_misc_encodings,
+    and stored one after another as a flat boolean array. The greedy
+    subsequence test of subseq_mapping is then run for all rows with the same k
+    simultaneously on the runs of their misc-encodings and the implicit
+    patterns, see first_patterns. Rows whose misc-encoding is in the distance
+    table (see load_distance_table) or the memo (see memo_lookup) are not
+    searched.
+
     Parameters
     ----------
-    p1: list
-        List of integers which represents a string of integers, or a permutation
-    p2: list
-        List of integers which represents a string of integers, or a permutation
+    permutations: numpy.ndarray
+        (m x n) integer array, each row contains one permutation.
 
     Returns
     -------
-    list
-        Composition of p1 * p2.
+    tuple
+        (encodings, distances) where encodings is the list of the m misc-encodings
+        and distances is an integer array of length m.
     """
-    comp_perm = [0 for _ in p1]
-    for x in range(0, len(p2)):
-        if 0 < p2[x]:
-            comp_perm[x] = p1[p2[x] - 1]
+    permutations = np.asarray(permutations)
+    border, negative = _batch_borders(permutations)
+
+    # Characters of all misc-substrings, ordered by row
+    negative = negative[border]
+    lengths = np.count_nonzero(border, axis=1)
+    offsets = np.cumsum(lengths) - lengths
+    encoding_string = np.where(negative, ord("n"), ord("p")).astype(np.uint8).tobytes().decode("ascii")
+    encodings = [encoding_string[start:end] for start, end in zip(offsets.tolist(), (offsets + lengths).tolist())]
+
+    # k = ceil(log2(#miscs)); the distance is k+1 unless a pattern of length 2^k matches
+    ks = np.ceil(np.log2(lengths)).astype(np.int64)
+    distances = ks + 1
+
+    # Encodings in the distance table are read at once from their bit values
+    in_table = np.flatnonzero(lengths <= _table_length)
+    if len(in_table):
+        positions = np.arange(_table_length)
+        chars = np.minimum(offsets[in_table, None] + positions, len(negative) - 1)
+        bits = negative[chars] & (positions < lengths[in_table, None])
+        index = 2 ** lengths[in_table] - 2 + (bits.astype(np.int64) << positions).sum(axis=1)
+        distances[in_table] = _table["distance"][index]
+        ks[in_table] = -1
+
+    # Memoized encodings are not searched; they are marked by k = -1
+    for row in np.flatnonzero(ks >= 0).tolist():
+        entry = memo_lookup(encodings[row], need_pattern=False)
+        if entry is not None:
+            distances[row] = entry[0]
+            ks[row] = -1
+
+    searched = np.flatnonzero(ks >= 0)
+    if len(searched) == 0:
+        return encodings, distances
+
+    run_lengths, run_offsets = batch_runs(negative, offsets)
+    first_n = negative[offsets]
+    if len(searched) < len(ks):
+        run_lengths, run_offsets = select_runs(run_lengths, run_offsets, ks >= 0)
+        first_n = first_n[searched]
+
+    for k in np.unique(ks[searched]).tolist():
+        group = ks[searched] == k
+        if group.all():
+            first = first_patterns(run_lengths, run_offsets, first_n, pattern_recipes(k))
         else:
-            comp_perm[x] = -p1[-p2[x] - 1]
-    return comp_perm
+            first = first_patterns(*select_runs(run_lengths, run_offsets, group), first_n[group],
+                                   pattern_recipes(k))
+        distances[searched[group][first >= 0]] = k
 
+    for row, dist in zip(searched.tolist(), distances[searched].tolist()):
+        memo_store(encodings[row], dist)
 
-def reverse(permutation):
+    return encodings, distances
+
+
+def bounded_submit(executor, func, tasks, jobs, ordered=True):
     """
-    Implements the reversion operation (for permutations or strings of integers)
+    Submits func(*args) to a process pool for every tuple args of tasks and
+    yields the results.
 
-    Returns the input list in reversed order, and with the signage of every
-    element switched (i.e. + -> - ; - -> +). Input strings have to be represented
-    by a list
+    Tasks are consumed lazily and at most 4 * jobs of them are in flight at any
+    time, hence memory is bounded independently of the number of tasks.
 
     Parameters
     ----------
-    permutation: list
-        List of integers which represents a string of integers, or a permutation
+    executor: concurrent.futures.Executor
+        Pool the tasks are submitted to.
+    func: callable
+        Function which is called with the arguments of each task.
+    tasks: iterable
+        Tuples of arguments.
+    jobs: int
+        Number of worker processes of executor.
+    ordered: bool
+        If True, results are yielded in the order of tasks. Otherwise they are
+        yielded as soon as their task is finished.
 
     Returns
     -------
-    list
-        List in which the order and signage of the input list is reversed.
+    generator
+        Yields (args, result) for every task.
+    """
+    window = 4 * jobs
+
+    if ordered:
+        pending = deque()
+        for args in tasks:
+            pending.append((args, executor.submit(func, *args)))
+            if len(pending) >= window:
+                args, future = pending.popleft()
+                yield args, future.result()
+        while pending:
+            args, future = pending.popleft()
+            yield args, future.result()
+        return
+
+    pending = {}
+    for args in tasks:
+        pending[executor.submit(func, *args)] = args
+        if len(pending) >= window:
+            for future in wait(pending, return_when=FIRST_COMPLETED)[0]:
+                yield pending.pop(future), future.result()
+    for future in as_completed(pending):
+        yield pending.pop(future), future.result()
+
+
+def worker_memmap(path):
+    """
+    Returns the memory map of a .npy file which was created by
+    numpy.lib.format.open_memmap, opened for writing. Every file is mapped once
+    per process, hence worker processes which write chunks of the same file,
+    see table.py and matrix.py, reuse their map.
     """
-    return [-1 * permutation[-i] for i in range(1, len(permutation) + 1)]
+    if path not in _worker_memmaps:
+        _worker_memmaps[path] = np.load(path, mmap_mode="r+")
+    return _worker_memmaps[path]
 
 
-def stringify(permutation):
+def random_permutations(m, n, seed=None, p_negative=0.5):
     """
-    Returns a string representation for a list (of integers, or any datatype
-    which possesses a str() representation)
+    Generates m random signed permutations of the elements 1, ..., n.
 
-    Every element in the returned string is separated by a space.
+    All permutations are generated at once by a NumPy Generator, hence the same
+    seed always yields the same permutations.
 
     Parameters
     ----------
-    permutation: list
-        List which should be stringifies, i.e., which shall be represented
-        as a space-separated string.
+    m: int
+        Number of permutations.
+    n: int
+        Length of each permutation.
+    seed: int
+        Seed of the random number generator, or a numpy.random.Generator.
+        A random seed is used if it is None.
+    p_negative: float
+        Probability of each element to be negative.
 
     Returns
     -------
-    str
-        String representation of l.
+    numpy.ndarray
+        (m x n) int32 array, each row contains one permutation. Can be passed to
+        batch_distances and batch_misc_encodings without conversion.
     """
-    return "".join([str(x) + " " for x in permutation])
+    rng = np.random.default_rng(seed)
 
+    permutations = rng.permuted(np.broadcast_to(np.arange(1, n + 1, dtype=np.int32), (m, n)), axis=1)
+    permutations[rng.random((m, n)) < p_negative] *= -1
 
-# noinspection PyPep8Naming
-def transformation(permutation, pattern, misc_dec, misc_mapping):
+    return permutations
+
+
+def _relabel(table, values):
     """
-    Implements transformation T.
+    Relabels a permutation, or a string of integers, by the identity whose
+    elements are given by table, i.e. computes composition(identity, values)
+    by one vectorized lookup. Returns a Permutation for a Permutation and a list
+    otherwise.
+    """
+    elements = np.asarray(values, dtype=table.dtype)
+    relabeled = table[np.abs(elements) - 1]
+    relabeled[elements < 0] *= -1
 
-    This function implements the transformation T and decides which case of the
-    Definition of the transformation should be invoked depending on the pattern
-    supplied. A tuple containing all relevant information of the permutation
-    which is obtained after applying T is returned.
+    if isinstance(values, Permutation):
+        return Permutation(relabeled.tobytes())
+    return relabeled.tolist()
+
+
+def _relabeled_step(table, step):
+    """
+    Returns step with the relabeled permutation, misc-encoding, L and R for the
+    relabeling table of an identity, see _relabel.
+    """
+    relabeled = _relabel(table, step.permutation)
+    relabeled_encoding = get_misc_encoding(np.asarray(relabeled))
+
+    if step.L is None:
+        return step._replace(relabeled=relabeled, relabeled_encoding=relabeled_encoding)
+
+    return step._replace(relabeled=relabeled, relabeled_encoding=relabeled_encoding,
+                         relabeled_L=_relabel(table, step.L), relabeled_R=_relabel(table, step.R))
+
+
+def _iter_steps(scenario_perm, misc_dec, dist, pattern, subseq_map, table=None):
+    """
+    Applies the transformation T until the identity is reached and yields one
+    Step for each permutation_k, k = dist, ..., 0. Only the current permutation
+    is referenced between two steps. If the relabeling table of an identity is
+    given, the steps contain the relabeled permutations, see _relabeled_step.
+    """
+    if table is not None:
+        for step in _iter_steps(scenario_perm, misc_dec, dist, pattern, subseq_map):
+            yield _relabeled_step(table, step)
+        return
+
+    k = dist
+    while k != 0:
+
+        # trns = (permutation, pattern, operation, L, R, misc_dec)
+        if _profile is not None:
+            _profile_start()
+        trns = transformation(scenario_perm, pattern, misc_dec, subseq_map)
+        if _profile is not None:
+            _profile_stop("transformation")
+
+        yield Step(k, scenario_perm, misc_dec, pattern, subseq_map, trns[2], trns[3], trns[4])
+        k -= 1
+
+        # assign permutation, misc_dec and the next pattern for next transformation
+        scenario_perm = trns[0]
+        misc_dec = trns[5]
+        pattern = (pattern_type(trns[1]), trns[1])
+        if _profile is not None:
+            _profile_start()
+        subseq_map = subseq_mapping(misc_dec, pattern[1])
+        if _profile is not None:
+            _profile_stop("pattern_search")
+
+    yield Step(0, scenario_perm, misc_dec, pattern, subseq_map, None, None, None)
+
+
+def sort_scenario(permutation, identity=None, lazy=False):
+    """
+    Computes an optimal sorting scenario by TDRL/iTDRL.
+
+    Follows the pseudocode of Algorithm 1, i.e. the transformation T is applied
+    until the identity is reached.
 
     Parameters
     ----------
     permutation: list
-        List representation of a permutation of the elements [1:n] which contains
-        every element exactly once.
-    pattern: tuple
-        A tuple that contains the type of pattern, i.e.
-        - TDRL for patterns satisfying pattern Definition (i) or (iv)
-        - riTDRL for patterns satisfying pattern Definition (ii)
-        - liTDRL for patterns satisfying pattern Definition (iii)
-        and the string that represents the pattern.
-    misc_dec: list
-        A List of tuples that represent the misc-decomposition and misc-encoding of
-        permutation. Can be acquired via get_misc_dec(permutation).
-    misc_mapping:
-        Dictionary which maps each character in pattern[1] to a character in the
-        misc-encoding of permutation.
+        List of n potentially negative elements where
+        every element occurs exactly once
+    identity: list
+        Optional permutation which is sorted into permutation instead of the
+        identity permutation. In this case the scenario is computed for sorting
+        the identity into identity^-1 * permutation. The steps then also
+        contain the permutations, misc-encodings, L and R relabeled by identity.
+    lazy: bool
+        If True, steps is a generator which computes each step when it is
+        requested, see iter_scenario. The distance is computed beforehand.
+
     Returns
     -------
-    tuple
-        Tuple which represents the permutation after the application of T.
-        Additional information like the next pattern, and the TDRL/iTDRL which
-        inverts T is included as well. The tuple has the shape
-        (permutation_after_T, nextpattern, TDRL/iTDRL, L, R).
-        permutation_after_T is the permutation after the application of T.
-        nextpattern is the pattern the misc-dec of permutation_after_T is subsequence of.
-        TDRL/iTDRL is a string which encodes the operation which reverses T, i.e.
-        "TDRL", "liTDRL", or "riTDRL"
-        L, R is the exact bipartition for TDRL/iTDRL which, applied to the
-        permutation_after_T yields the input permutation.
+    Scenario
+        Namedtuple (distance, permutation, identity, steps) where steps contains
+        one Step for each permutation_k, k = distance, ..., 0.
     """
+    if not isinstance(permutation, Permutation):
+        permutation = list(permutation)
+    scenario_perm = permutation
+
+    # To sort identity to pi we apply the inverse of identity to pi. The steps
+    # are relabeled by identity, whose elements are looked up in table.
+    table = None
+    if identity is not None:
+        identity = list(identity)
+        scenario_perm = composition(inverse(identity), scenario_perm)
+        table = np.asarray(identity, dtype=np.intc)
+
+    if _profile is not None:
+        _profile_start()
+    misc_dec = get_misc_dec(scenario_perm)
+    if _profile is not None:
+        _profile_stop("misc_decomposition")
+        _profile_start()
+    dist, pattern, subseq_map = find_pattern(misc_dec)
+    if _profile is not None:
+        _profile_stop("pattern_search")
+
+    steps = _iter_steps(scenario_perm, misc_dec, dist, pattern, subseq_map, table)
+    if not lazy:
+        steps = list(steps)
+
+    return Scenario(dist, permutation, identity, steps)
+
+
+def iter_scenario(permutation, identity=None):
+    """
+    Lazily computes an optimal sorting scenario by TDRL/iTDRL.
 
-    # Contains the permutation after application of T
-    taus = []
-    newpat = ""
+    Yields the same steps as sort_scenario, but each step is computed only when
+    it is requested. Hence a consumer which only needs the first operations may
+    stop early, and steps which were already consumed are not kept in memory.
+    The first step has k = distance.
 
+    Parameters
+    ----------
+    permutation: list
+        List of n potentially negative elements where
+        every element occurs exactly once
+    identity: list
+        Optional identity, see sort_scenario.
 
-    L = ""
-    R = ""
+    Returns
+    -------
+    generator
+        Yields one Step for each permutation_k, k = distance, ..., 0.
+    """
+    return sort_scenario(permutation, identity, lazy=True).steps
 
-    # Stores the length, and the middle of pattern
-    l_full = len(pattern[1])
-    l_half = int(l_full / 2)
 
-    # T is reversible by a TDRL, or is the inverse of a TDRL
-    if pattern[0] == "TDRL":
+def format_perm(permutation):
+    """
+    Returns the canonical one-line representation of a permutation, i.e.
+    "( 2 4 7 -8 3 -1 -6 -5 )".
 
-        # Derive pattern T(permutation,pattern) is subsequence of.
-        # For TDRL, this is the first half of the input pattern
-        newpat = "".join(pattern[1][0:l_half])
-
-        # The taus are sequentially created in this loop and appended to the
-        # output permutation.
-        for i in range(0, l_half):
-            try:
-                index_left = misc_dec[misc_mapping[i]][1]
-                index_right = misc_dec[misc_mapping[i]][2]
-                misc_1 = permutation[index_left:index_right]
-            except KeyError:
-                misc_1 = []
-            try:
-                index_left = misc_dec[misc_mapping[l_half + i]][1]
-                index_right = misc_dec[misc_mapping[l_half + i]][2]
-                misc_2 = permutation[index_left:index_right]
-            except KeyError:
-                misc_2 = []
-
-            # A string representation for L and R is created sequentially.
-            L += stringify(misc_1)
-            R += stringify(misc_2)
-
-            # The sorted misc-substrings are appended to the output permutation.
-            taus += oplus(misc_1, misc_2)
+    Parameters
+    ----------
+    permutation: list
+        List of n unique elements which represent a permutation
 
-    # T is reversible by an liTDRL, hence is the inverse of an liTDRL
-    elif pattern[0] == "liTDRL":
+    Returns
+    -------
+    str
+        Canonical one-line representation of the permutation.
+    """
+    return "( " + " ".join(map(str, permutation)) + " )"
 
-        # Derive pattern T(permutation,pattern) is subsequence of.
-        # For liTDRL this is the last half of the pattern.
-        newpat = "".join(pattern[1][l_half:len(pattern[1])])
-
-        # The taus are sequentially created in this loop and appended to the
-        # output permutation.
-        for i in range(0, l_half):
-            try:
-                index_left = misc_dec[misc_mapping[l_half - i - 1]][1]
-                index_right = misc_dec[misc_mapping[l_half - i - 1]][2]
-                misc_1 = permutation[index_left:index_right]
-            except KeyError:
-                misc_1 = []
-            try:
-                index_left = misc_dec[misc_mapping[l_half + i]][1]
-                index_right = misc_dec[misc_mapping[l_half + i]][2]
-                misc_2 = permutation[index_left:index_right]
-            except KeyError:
-                misc_2 = []
-
-            # A string representation of L and R is created sequentially.
-            # According to the definition of T, misc_1 is reversed.
-            L += stringify(reverse(misc_1))
-            R += stringify(misc_2)
-
-            # The sorted misc-substrings are appended to the output permutation.
-            # According to the definition of T, misc_1 is reversed.
-            taus += oplus(reverse(misc_1), misc_2)
 
-    # T is reversible by an riTDRL, hence is the inverse of an riTDRL
-    elif pattern[0] == "riTDRL":
+def format_misc_enc(misc_encoding, misc_mapping, pattern_length):
+    """
+    Returns a subsequence aware, i.e. aligned misc-encoding, see pprint_misc_enc.
 
-        # Derive pattern T(permutation,pattern) is subsequence of.
-        # For riTDRL, this is the first half of the input pattern
-        newpat = "".join(pattern[1][0:l_half])
-        for i in range(0, l_half):
-            try:
-                index_left = misc_dec[misc_mapping[i]][1]
-                index_right = misc_dec[misc_mapping[i]][2]
-                misc_1 = permutation[index_left:index_right]
-            except KeyError:
-                misc_1 = []
-            try:
-                index_left = misc_dec[misc_mapping[l_full - i - 1]][1]
-                index_right = misc_dec[misc_mapping[l_full - i - 1]][2]
-                misc_2 = permutation[index_left:index_right]
-            except KeyError:
-                misc_2 = []
-
-            # A string representation of L and R is created sequentially.
-            # According to the definition of T, misc_2 is reversed.
-            L += stringify(misc_1)
-            R += stringify(reverse(misc_2))
-
-            # The sorted misc-substrings are appended to the output permutation.
-            # According to the definition of T, misc_1 is reversed.
-            taus += oplus(misc_1, reverse(misc_2))
-
-    return taus, newpat, pattern[0], L, R
+    Returns
+    -------
+    str
+        Misc-encoding in which each character is placed at the position of the
+        pattern character it is mapped to, and every other position is a space.
+    """
+    chars = [" "] * pattern_length
+    for i, j in misc_mapping.items():
+        if i < pattern_length:
+            chars[i] = misc_encoding[j][0]
+    return "".join(chars)
 
 
 def pprint_perm(permutation, endl=True):
@@ -497,7 +2112,6 @@ def pprint_perm(permutation, endl=True):
     by a list.
 
 
-
     Parameters
     ----------
     permutation: list
@@ -508,9 +2122,9 @@ def pprint_perm(permutation, endl=True):
 
     """
     if(endl):
-        print("( " + "".join([str(x) + " " for x in permutation])[0:-1] + " )")
+        print(format_perm(permutation))
     else:
-        print("( " + "".join([str(x) + " " for x in permutation])[0:-1] + " )", end="")
+        print(format_perm(permutation), end="")
 
 def pprint_misc_enc(misc_encoding, misc_mapping,pattern_length):
     """
@@ -538,11 +2152,4 @@ def pprint_misc_enc(misc_encoding, misc_mapping,pattern_length):
     str
         Canonical one-line representation of the permutation.
     """
-    print_string = ""
-    keys = misc_mapping.keys()
-    for i in range(pattern_length):
-        if i in keys:
-            print_string += misc_encoding[misc_mapping[i]][0]
-        else:
-            print_string += " "
-    print(print_string)
\ No newline at end of file
+    print(format_misc_enc(misc_encoding, misc_mapping, pattern_length))
@@ -0,0 +1,147 @@
+from lib import *
+from batch import parse_permutation
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Gene orders and their inverses in a worker process, see init_matrix_worker.
+_orders = None
+_inverses = None
+
+
+def read_gene_orders(lines):
+    """
+    Reads gene orders, one whitespace separated signed permutation per line.
+
+    Parameters
+    ----------
+    lines: iterable
+        Input lines. Empty lines are skipped.
+
+    Returns
+    -------
+    numpy.ndarray
+        (m x n) int32 array which contains one gene order per row, in input order.
+    """
+    orders = [parse_permutation(line) for line in lines if line.strip()]
+    if not orders:
+        raise ValueError("no gene orders given")
+
+    n = len(orders[0])
+    identity = list(range(1, n + 1))
+    for i, order in enumerate(orders):
+        if sorted(abs(x) for x in order) != identity:
+            raise ValueError("gene order " + str(i + 1) + " is not a signed permutation of 1, ..., " + str(n))
+
+    return np.array(orders, dtype=np.int32)
+
+
+def inverse_matrix(orders):
+    """
+    Computes the inverses of all rows of a matrix of permutations at once, see inverse.
+    """
+    m, n = orders.shape
+    inverses = np.empty_like(orders)
+    positions = np.broadcast_to(np.arange(1, n + 1, dtype=orders.dtype), (m, n))
+    inverses[np.arange(m)[:, None], np.abs(orders) - 1] = np.where(orders > 0, positions, -positions)
+    return inverses
+
+
+def distance_rows(orders, inverses, start, end):
+    """
+    Computes the rows start, ..., end-1 of the distance matrix of a set of gene orders.
+
+    Entry (i, j) is the TDRL/iTDRL distance for sorting gene order i into gene
+    order j, i.e. distance(orders[j], orders[i]). For every row, all gene orders
+    are relabeled by the precomputed inverse of gene order i, see composition,
+    and the distances of all relabeled permutations of the chunk are computed
+    at once by batch_distances. Pairs of equal gene orders have distance 0.
+
+    Returns
+    -------
+    numpy.ndarray
+        (end - start) x m integer array.
+    """
+    m, n = orders.shape
+    signs = np.where(orders < 0, -1, 1).astype(orders.dtype)
+    indices = np.abs(orders) - 1
+
+    # relabeled[r, j] = inverse(orders[start + r]) * orders[j]
+    relabeled = inverses[start:end][:, indices] * signs
+    distances = batch_distances(relabeled.reshape(-1, n))[1]
+
+    return distances.reshape(end - start, m)
+
+
+def init_matrix_worker(table_path, orders, inverses):
+    """
+    Initializes a worker process with the distance table of the parent process,
+    the gene orders and their inverses.
+    """
+    global _orders, _inverses
+    if table_path is not None:
+        load_distance_table(table_path)
+    _orders, _inverses = orders, inverses
+
+
+def process_rows(path, start, end):
+    """
+    Computes the rows start, ..., end-1 of the distance matrix in a worker process
+    and writes them to the memory-mapped matrix in path, see worker_memmap.
+    """
+    matrix = worker_memmap(path)
+    matrix[start:end] = distance_rows(_orders, _inverses, start, end)
+    matrix.flush()
+
+
+def distance_matrix(orders, path, jobs=1, chunksize=64):
+    """
+    Computes the TDRL/iTDRL distances between all ordered pairs of gene orders
+    and stores them as a memory-mapped .npy file.
+
+    Each inverse is computed once, and each ordered pair once. The distance is
+    not symmetric, hence entry (i, j) and (j, i) are computed separately. Chunks
+    of rows are processed by jobs worker processes which write their rows into
+    the output file directly, hence the matrix is never held in memory as a whole.
+
+    Parameters
+    ----------
+    orders: numpy.ndarray
+        (m x n) integer array, one gene order per row, see read_gene_orders.
+    path: str
+        Path of the .npy file the (m x m) int16 matrix is written to. Entry (i, j)
+        is the distance for sorting gene order i into gene order j, see distance_rows.
+    jobs: int
+        Number of worker processes. For jobs <= 1, rows are computed in the
+        current process.
+    chunksize: int
+        Number of rows computed at once.
+
+    Returns
+    -------
+    numpy.memmap
+        The distance matrix, opened read-only.
+    """
+    orders = np.asarray(orders, dtype=np.int32)
+    inverses = inverse_matrix(orders)
+    m = len(orders)
+
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.int16, shape=(m, m))
+    chunks = [(start, min(start + chunksize, m)) for start in range(0, m, chunksize)]
+
+    if jobs <= 1:
+        for start, end in chunks:
+            matrix[start:end] = distance_rows(orders, inverses, start, end)
+        matrix.flush()
+        del matrix
+        return np.load(path, mmap_mode="r")
+
+    matrix.flush()
+    del matrix
+
+    # Workers share the distance table of this process
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_matrix_worker,
+                             initargs=(get_distance_table(), orders, inverses)) as executor:
+        for _ in bounded_submit(executor, process_rows, ((path,) + chunk for chunk in chunks), jobs, ordered=False):
+            pass
+
+    return np.load(path, mmap_mode="r")
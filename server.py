@@ -0,0 +1,294 @@
+from lib import *
+from batch import init_worker, scenario_record
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import json
+import socket
+import sys
+
+
+def parse_args():
+    cli_parser = argparse.ArgumentParser(description="Serves TDRL/iTDRL distances and sorting scenarios as JSON " +
+                                                     "lines over a Unix domain socket or localhost TCP.")
+
+    cli_parser.add_argument("--socket", type=str, help="path of the Unix domain socket to listen on")
+    cli_parser.add_argument("--port", type=int, default=8765, help="localhost TCP port to listen on if --socket is not set")
+    cli_parser.add_argument("-j", "--jobs", type=int, default=1,
+                            help="number of worker processes; 0 computes requests in the server process")
+    cli_parser.add_argument("--memo-size", type=int, default=get_memo_size(),
+                            help="number of misc-encodings whose distances are kept in every process")
+    cli_parser.add_argument("--memo-bytes", type=int, default=get_memo_max_bytes(),
+                            help="maximum memory of the memo of every process in bytes")
+    cli_parser.add_argument("--memo", type=str, help="file written by save_memo which is loaded at startup")
+    cli_parser.add_argument("--table", type=str, help="distance table created by table.py which is shared by all processes")
+    return cli_parser.parse_args()
+
+
+def request_encoding(request):
+    """
+    Returns the misc-encoding of the permutation of a distance request, relabeled
+    by the inverse of its identity, if given, as in distance.
+    """
+    permutation = request["permutation"]
+    if request.get("identity") is not None:
+        permutation = composition(inverse(request["identity"]), permutation)
+    return get_misc_encoding(permutation)
+
+
+def handle_request(request, with_encoding=False):
+    """
+    Computes the response to a single request.
+
+    A request is a dict with the type "distance", "scenario" or "batch", and
+    "permutation" (or "permutations" for batch) and an optional "identity".
+    Distance requests may instead contain the "encoding" of the permutation.
+    A batch contains "scenario" records, or only distances if "distance_only"
+    is set. If with_encoding is set, the response to a distance request for a
+    permutation also contains its misc-encoding, see request_encoding.
+
+    Returns
+    -------
+    dict
+        Contains "distance", "scenario" or "results", or "error" if the request
+        could not be processed.
+    """
+    try:
+        kind = request.get("type", "scenario")
+        identity = request.get("identity")
+
+        if kind == "distance":
+            if "encoding" in request:
+                return {"distance": encoding_distance(request["encoding"])}
+            if with_encoding:
+                encoding = request_encoding(request)
+                return {"distance": encoding_distance(encoding), "encoding": encoding}
+            return {"distance": distance(request["permutation"], identity)}
+
+        if kind == "scenario":
+            return {"scenario": scenario_record(sort_scenario(request["permutation"], identity))}
+
+        if kind == "batch":
+            if request.get("distance_only", False):
+                return {"results": [distance(permutation, identity) for permutation in request["permutations"]]}
+            return {"results": [scenario_record(sort_scenario(permutation, identity))
+                                for permutation in request["permutations"]]}
+
+        raise ValueError("unknown request type " + str(kind))
+    except (ValueError, IndexError, KeyError, TypeError, AttributeError) as err:
+        return {"error": str(err) or type(err).__name__}
+
+
+def handle_requests(requests):
+    """
+    Computes the responses to several requests which were batched together.
+    Responses to distance requests contain the misc-encoding, which is stored
+    in the memo of the server process, see SortServer.submit.
+    """
+    return [handle_request(request, with_encoding=True) for request in requests]
+
+
+def init_server_worker(memo_size=None, memo_max_bytes=None, memo_path=None, table_path=None):
+    """
+    Initializes a worker process with the memo and distance table settings of
+    the server.
+    """
+    if memo_size is not None:
+        set_memo_size(memo_size)
+    if memo_max_bytes is not None:
+        set_memo_max_bytes(memo_max_bytes)
+    init_worker(memo_path, table_path)
+
+
+class SortServer:
+    """
+    asyncio front end which dispatches requests to a process pool.
+
+    Requests which arrive in the same iteration of the event loop are sent to
+    the pool as one task. Distances are memoized by misc-encoding in the server
+    process, see memo_lookup: workers return the misc-encoding with every
+    distance, and distance requests which contain an encoding that is in the
+    memo or the distance table are answered without the pool.
+
+    Parameters
+    ----------
+    jobs: int
+        Number of worker processes. For jobs <= 0, requests are computed in the
+        server process.
+    memo_path: str
+        Optional file written by save_memo which is loaded by every process.
+    """
+
+    def __init__(self, jobs=1, memo_path=None):
+        self.pending = []
+        self.executor = None
+
+        if memo_path is not None:
+            load_memo(memo_path)
+
+        if jobs > 0:
+            self.executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_server_worker,
+                                                initargs=(get_memo_size(), get_memo_max_bytes(), memo_path,
+                                                          get_distance_table()))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    async def submit(self, request):
+        """
+        Returns the response to a request.
+
+        Only distance requests which contain the misc-encoding are looked up in
+        the distance table and the memo of this process. The misc-encodings of
+        permutations are computed by the workers, which return them with the
+        distance, hence no O(n) work is done in the event loop.
+        """
+        if request.get("type") == "distance" and "encoding" in request:
+            try:
+                entry = table_lookup(request["encoding"]) or memo_lookup(request["encoding"], need_pattern=False)
+            except (ValueError, IndexError, KeyError, TypeError, AttributeError) as err:
+                return {"error": str(err) or type(err).__name__}
+            if entry is not None:
+                return {"distance": entry[0]}
+
+        if self.executor is None:
+            response = handle_request(request, with_encoding=True)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            if not self.pending:
+                asyncio.get_running_loop().call_soon(self.flush)
+            self.pending.append((request, future))
+            response = await future
+
+        if "encoding" in response:
+            response = dict(response)
+            memo_store(response.pop("encoding"), response["distance"])
+        elif request.get("type") == "distance" and "distance" in response:
+            memo_store(request["encoding"], response["distance"])
+        return response
+
+    def flush(self):
+        """
+        Sends all pending requests to the pool as one task.
+        """
+        pending, self.pending = self.pending, []
+        task = asyncio.get_running_loop().run_in_executor(self.executor, handle_requests,
+                                                          [request for request, future in pending])
+
+        def resolve(task):
+            if task.exception() is not None:
+                responses = [{"error": str(task.exception())}] * len(pending)
+            else:
+                responses = task.result()
+            for (request, future), response in zip(pending, responses):
+                if not future.done():
+                    future.set_result(response)
+
+        task.add_done_callback(resolve)
+
+    async def respond(self, line, writer):
+        """
+        Answers a single JSON line. The response contains the "id" of the request.
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request is not a JSON object")
+        except ValueError as err:
+            response = {"error": str(err)}
+            request = {}
+        else:
+            response = await self.submit(request)
+
+        if "id" in request:
+            response = dict(response, id=request["id"])
+        writer.write((json.dumps(response, separators=(",", ":")) + "\n").encode())
+
+    async def handle_connection(self, reader, writer):
+        """
+        Reads JSON lines from a connection. Requests of a connection are processed
+        concurrently, hence responses may arrive in a different order.
+        """
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.ensure_future(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.wait(tasks)
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(server, path=None, port=8765):
+    """
+    Listens on the Unix domain socket path, or on localhost port if path is None,
+    until the process is terminated.
+    """
+    if path is not None:
+        listener = await asyncio.start_unix_server(server.handle_connection, path=path)
+    else:
+        listener = await asyncio.start_server(server.handle_connection, host="127.0.0.1", port=port)
+
+    print("Listening on " + (path if path is not None else "127.0.0.1:" + str(port)), file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def query(request, path=None, port=8765):
+    """
+    Sends a single request to a running server and returns its response.
+
+    Parameters
+    ----------
+    request: dict
+        Request, see handle_request.
+    path: str
+        Path of the Unix domain socket of the server. If None, the server is
+        reached on localhost port.
+
+    Returns
+    -------
+    dict
+        Response of the server.
+    """
+    if path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+    else:
+        connection = socket.create_connection(("127.0.0.1", port))
+
+    with connection, connection.makefile("rwb") as stream:
+        stream.write((json.dumps(request) + "\n").encode())
+        stream.flush()
+        connection.shutdown(socket.SHUT_WR)
+        return json.loads(stream.readline())
+
+
+def main():
+    args = parse_args()
+
+    if args.table:
+        load_distance_table(args.table)
+    set_memo_size(args.memo_size)
+    set_memo_max_bytes(args.memo_bytes)
+    server = SortServer(args.jobs, args.memo)
+    try:
+        asyncio.run(serve(server, args.socket, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+from lib import *
+from collections import namedtuple
+import argparse
+import json
+import sys
+import numpy as np
+
+# Evolved permutations of m lineages after k operations, together with the true
+# operations. Operation t = 1, ..., k of lineage i is the TDRL/iTDRL
+# PATTERN_TYPES[types[t-1, i]] with L = lr[t-1, i, :left[t-1, i]] and
+# R = lr[t-1, i, left[t-1, i]:], which are subsequences of the permutation of
+# lineage i after t-1 operations, see apply_operation.
+Simulation = namedtuple("Simulation", ["permutations", "types", "left", "lr"])
+
+
+def parse_args():
+    cli_parser = argparse.ArgumentParser(description="Simulates the evolution of signed permutations by random " +
+                                                     "TDRL/iTDRL.")
+
+    cli_parser.add_argument("-m", "--lineages", type=int, default=1, help="number of simulated lineages")
+    cli_parser.add_argument("-n", "--length", type=int, required=True, help="length of the permutations")
+    cli_parser.add_argument("-k", "--operations", type=int, required=True, help="number of operations per lineage")
+    cli_parser.add_argument("-s", "--seed", type=int, help="seed of the simulation")
+    cli_parser.add_argument("--weights", type=str, default="1 1 1",
+                            help="space separated relative frequencies of TDRL, riTDRL and liTDRL")
+    cli_parser.add_argument("-o", "--output", type=str,
+                            help="output file; .npz for NumPy arrays, otherwise one JSON object per lineage. " +
+                                 "\nDefaults to JSON on stdout.")
+    cli_parser.add_argument("--check", action="store_true",
+                            help="check that the distance of every evolved permutation is at most the number " +
+                                 "\nof operations; exits with status 1 otherwise")
+    return cli_parser.parse_args()
+
+
+def simulate(m, n, k, seed=None, weights=(1, 1, 1), p_left=0.5):
+    """
+    Evolves m lineages, starting from the identity permutation of length n, by k
+    random TDRL/iTDRL each.
+
+    Every operation is drawn independently for each lineage: its type is TDRL,
+    riTDRL or liTDRL with probability proportional to weights, and each element
+    remains in the left copy, i.e. in L, with probability p_left. All lineages
+    are evolved at once by vectorized operations on an (m x n) matrix.
+
+    Parameters
+    ----------
+    m: int
+        Number of lineages.
+    n: int
+        Length of the permutations.
+    k: int
+        Number of operations per lineage.
+    seed: int
+        Seed of the random number generator, or a numpy.random.Generator.
+    weights: tuple
+        Relative frequencies of the types in the order of PATTERN_TYPES.
+    p_left: float
+        Probability of each element to remain in L.
+
+    Returns
+    -------
+    Simulation
+        Namedtuple (permutations, types, left, lr) of NumPy arrays, see Simulation.
+    """
+    rng = np.random.default_rng(seed)
+    probabilities = np.asarray(weights, dtype=float) / np.sum(weights)
+
+    permutations = np.broadcast_to(np.arange(1, n + 1, dtype=np.int32), (m, n)).copy()
+    types = np.empty((k, m), dtype=np.uint8)
+    left = np.empty((k, m), dtype=np.int32)
+    lr = np.empty((k, m, n), dtype=np.int32)
+
+    columns = np.arange(n)
+    rows = np.arange(m)[:, None]
+
+    for t in range(k):
+        types[t] = rng.choice(len(PATTERN_TYPES), size=m, p=probabilities)
+
+        # L and R are the elements which remain in the left, and the right copy,
+        # in the order of the permutation. A stable sort by copy yields L + R.
+        in_right = rng.random((m, n)) >= p_left
+        left[t] = n - np.count_nonzero(in_right, axis=1)
+        lr[t] = permutations[rows, np.argsort(in_right, axis=1, kind="stable")]
+
+        # Positions of L + R which are taken for each position of the result,
+        # and whether the element is inverted.
+        l = left[t][:, None]
+        source = np.broadcast_to(columns, (m, n)).copy()
+        inverted = np.zeros((m, n), dtype=bool)
+
+        reverse_right = (types[t] == PATTERN_TYPES.index("riTDRL"))[:, None] & (columns >= l)
+        source[reverse_right] = np.broadcast_to(l + n - 1 - columns, (m, n))[reverse_right]
+        inverted |= reverse_right
+
+        reverse_left = (types[t] == PATTERN_TYPES.index("liTDRL"))[:, None] & (columns < l)
+        source[reverse_left] = np.broadcast_to(l - 1 - columns, (m, n))[reverse_left]
+        inverted |= reverse_left
+
+        permutations = lr[t][rows, source]
+        permutations[inverted] *= -1
+
+    return Simulation(permutations, types, left, lr)
+
+
+def lineage_operations(simulation, i):
+    """
+    Returns the true operations of lineage i as a list of (operation, L, R), in
+    the order in which they were applied.
+    """
+    operations = []
+    for t in range(len(simulation.types)):
+        l = simulation.left[t, i]
+        lr = simulation.lr[t, i].tolist()
+        operations.append((PATTERN_TYPES[simulation.types[t, i]], lr[:l], lr[l:]))
+    return operations
+
+
+def check_simulation(simulation):
+    """
+    Computes the distances of all evolved permutations by batch_distances.
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices of the lineages whose distance exceeds the number of operations,
+        which is an upper bound of the distance.
+    """
+    distances = batch_distances(simulation.permutations)[1]
+    return np.flatnonzero(distances > len(simulation.types))
+
+
+def main():
+    args = parse_args()
+
+    weights = [float(x) for x in args.weights.split()]
+    simulation = simulate(args.lineages, args.length, args.operations, args.seed, weights)
+
+    if args.output and args.output.endswith(".npz"):
+        np.savez(args.output, permutations=simulation.permutations, types=simulation.types,
+                 left=simulation.left, lr=simulation.lr)
+    else:
+        outfile = open(args.output, "w") if args.output else sys.stdout
+        for i in range(len(simulation.permutations)):
+            record = {"permutation": simulation.permutations[i].tolist(),
+                      "operations": [{"operation": operation, "L": L, "R": R}
+                                     for operation, L, R in lineage_operations(simulation, i)]}
+            outfile.write(json.dumps(record, separators=(",", ":")) + "\n")
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    if args.check:
+        exceeding = check_simulation(simulation)
+        if len(exceeding):
+            print(str(len(exceeding)) + " lineages have a distance larger than " + str(args.operations) +
+                  ", e.g. lineage " + str(exceeding[0]), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,239 +1,178 @@
 from lib import *
+from batch import run_batch
+from writers import write_scenario
+from matrix import read_gene_orders, distance_matrix
 import argparse
-from math import log2, ceil
-from numpy.random import permutation as rand_perm
-import random
+import contextlib
+import json
+import os
+import sys
 import time
 
 
-cli_parser = argparse.ArgumentParser()
-
-cli_parser.add_argument("-r", "--random", type=int, help="randomly generate a permutation;" +
-                                                         "\nspecify length as argument.")
-cli_parser.add_argument("-p", "--permutation", type=str,help="space separated target permutation, " +
-                                                    "\ni.e. 3 1 2 -4 -5 -6 7 8. ")
-cli_parser.add_argument("-i", "--identity", type=str, help="space separated identity permutation, " +
-                                                 "\ni.e. 1 2 3 4 5 6 7 8. \nThis argument is ignored if " +
-                                                 "-p/--permutation is not set.")
-cli_parser.add_argument("-t", "--tabular", action="store_true", help="switches output to tabular")
-args = cli_parser.parse_args()
-
-permutation = []
-identity = []
-
-# Either take the input permutation, generate a random permutation, or default
-# to a permutation containing 37 elements in case neither -p nor -r are set.
-if args.permutation:
-    permutation = [int(x) for x in args.permutation.split(" ")]
-elif args.random:
-    permutation = list(rand_perm(args.random))
-
-    # we randomly assign each element a +/- with 50/50 probability
-    for i in range(0, len(permutation)):
-        permutation[i] += 1
-        r = random.randint(0, 10)
-        if r >= 5:
-            permutation[i] *= -1
-else:
-    permutation = list(rand_perm(37))
-    for i in range(0, len(permutation)):
-        permutation[i] += 1
-        r = random.randint(0, 10)
-        if r >= 5:
-            permutation[i] *= -1
-
-# If an identity permutation is specified, we alter the input permutation such
-# that the output is for optimally sorting identity -> permutation
-if args.identity:
-    identity = [int(x) for x in args.identity.split(" ")]
-
-    # To sort identity to pi we apply the inverse of identity to pi
-    # (and the identity itself).
-    inv_identity = inverse(identity)
-    permutation = composition(inv_identity, permutation)
-
-t1 = time.time()
-
-# The following code follows the pseudocode of Algorithm 1 closely.
-misc_dec = get_misc_dec(permutation)
-k = ceil(log2(len(misc_dec)))
-patterns = get_patterns(k)
-subseq_map = {}
-
-dist = -1
-pattern = ""
-
-# for the case that d(identity,permutation) is k
-for p in patterns:
-    subseq_map = subseq_mapping(misc_dec, p[1])
-    if len(subseq_map) == 0:
-        continue
-    else:
-        dist = k
-        pattern = p
-        break
-
-# for the case that d(identity,permutation) is k+1
-if dist == -1:
-    dist = k + 1
-    patterns = get_patterns(dist)
-    for p in patterns:
-        subseq_map = subseq_mapping(misc_dec, p[1])
-        if len(subseq_map) == 0:
-            continue
+def parse_args():
+    cli_parser = argparse.ArgumentParser()
+
+    cli_parser.add_argument("-r", "--random", type=int, help="randomly generate a permutation;" +
+                                                             "\nspecify length as argument.")
+    cli_parser.add_argument("-m", "--count", type=int, help="number of random permutations generated by -r/--random; " +
+                                                           "\nthey are sorted as in batch mode.")
+    cli_parser.add_argument("-s", "--seed", type=int, help="seed for -r/--random; equal seeds yield equal permutations.")
+    cli_parser.add_argument("-p", "--permutation", type=str,help="space separated target permutation, " +
+                                                        "\ni.e. 3 1 2 -4 -5 -6 7 8. ")
+    cli_parser.add_argument("-i", "--identity", type=str, help="space separated identity permutation, " +
+                                                     "\ni.e. 1 2 3 4 5 6 7 8. \nThis argument is ignored if " +
+                                                     "-p/--permutation is not set.")
+    cli_parser.add_argument("-t", "--tabular", action="store_true", help="switches output to tabular")
+    cli_parser.add_argument("-d", "--distance-only", action="store_true",
+                            help="only compute and output the distance, not the sorting scenario")
+    cli_parser.add_argument("-b", "--batch", type=str, help="file containing one space separated permutation per line, " +
+                                                          "\nor - for stdin. A permutation may be followed by a tab and an " +
+                                                          "identity which overrides -i/--identity for this line.")
+    cli_parser.add_argument("-M", "--matrix", type=str,
+                            help="file containing one space separated gene order per line; computes the distances " +
+                                 "\nbetween all ordered pairs and writes them to -o/--output.")
+    cli_parser.add_argument("-o", "--output", type=str, default="distances.npy",
+                            help="output .npy file of -M/--matrix; entry (i, j) is the distance for sorting " +
+                                 "\ngene order i into gene order j.")
+    cli_parser.add_argument("-f", "--format", type=str, choices=["verbose", "tabular", "ndjson", "tsv", "csv"],
+                            help="output format; verbose (default) or tabular (same as -t), or ndjson, tsv or csv " +
+                                 "\nwith one record per step. In batch mode ndjson (default), tsv or csv " +
+                                 "\nwith one record per permutation.")
+    cli_parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes in batch mode")
+    cli_parser.add_argument("--chunksize", type=int, default=64, help="number of permutations sent to a worker at once")
+    cli_parser.add_argument("--unordered", action="store_true",
+                            help="output results as soon as they are available instead of in input order")
+    cli_parser.add_argument("--profile", action="store_true",
+                            help="write per-stage timings, counters and the peak memory as JSON to stderr; " +
+                                 "\nnot available in batch mode.")
+    cli_parser.add_argument("--memo", type=str,
+                            help="JSON file of memoized distances and patterns by misc-encoding; loaded at " +
+                                 "\nstartup if it exists and saved on exit.")
+    cli_parser.add_argument("--memo-size", type=int, default=get_memo_size(),
+                            help="maximum number of misc-encodings in the memo; 0 disables it")
+    cli_parser.add_argument("--memo-bytes", type=int, default=get_memo_max_bytes(),
+                            help="maximum memory of the memo in bytes")
+    cli_parser.add_argument("--table", type=str,
+                            help="distance table created by table.py; misc-encodings it contains are looked up " +
+                                 "\ninstead of searched.")
+    cli_parser.add_argument("--memo-stats", action="store_true",
+                            help="write the hits, misses and evictions of the memo as JSON to stderr")
+    return cli_parser.parse_args()
+
+
+def main_batch(args):
+    identity = None
+    if args.identity:
+        identity = [int(x) for x in args.identity.split(" ")]
+
+    if args.batch:
+        if args.batch == "-":
+            infile = sys.stdin
         else:
-            pattern = p
-            break
+            infile = open(args.batch, "r")
+    else:
+        # Random permutations are passed as lines, just like permutations read from a file
+        permutations = random_permutations(args.count, args.random, args.seed)
+        infile = contextlib.nullcontext(" ".join(map(str, row)) for row in permutations.tolist())
 
-# Initial output for tabular and verbose
-if args.tabular:
-    print("Permutation_k" + "\t" + "TDRL/iTDRL" + "\t" + "γ_k")
+    with infile as lines:
+        sys.stdout.writelines(line + "\n" for line in run_batch(lines, identity, args.format, args.jobs,
+                                                                args.chunksize, not args.unordered,
+                                                                args.distance_only, args.memo))
 
-    if args.identity:
-        # Output relabeled permutation
-        pprint_perm(composition(identity, permutation), endl=False)
-        print("\t", end="")
-    else:
-        pprint_perm(permutation, endl=False)
-        print("\t", end="")
 
-else:
-    # Verbose output for input permutation
-    print()
-    print()
+def main_matrix(args):
+    with open(args.matrix, "r") as infile:
+        orders = read_gene_orders(infile)
 
-    print("Distance: " + str(dist) + " TDRL/iTDRL")
-    print("----------------------")
+    distance_matrix(orders, args.output, args.jobs, args.chunksize)
 
-    print()
-    print("Permutation_" + str(dist) + ": ", end="")
-    pprint_perm(permutation)
 
-    print("MISC-Encoding: ", end="")
-    pprint_misc_enc(misc_dec, subseq_map, len(pattern[1]))
+def main_single(args, permutation, identity):
+    if args.distance_only:
+        dist = distance(permutation, identity)
+        with profile_stage("output"):
+            print(dist)
+        return
 
-    print("Pattern      : ", end="")
-    print(pattern[1])
+    t1 = time.time()
 
-    if args.identity:
+    # Steps are computed while they are printed
+    scenario = sort_scenario(permutation, identity, lazy=True)
 
-        # Since we set permutation = identity^-1 * permutation at the beginning,
-        # we relabel by identity * permutation.
-        print("Permutation_" + str(dist) + ": ", end="")
-        pprint_perm(composition(identity, permutation), endl=False)
-        print(" (relabeled)")
-
-        print("MISC-Encoding: ", end="")
-        print("".join([_[0] for _ in get_misc_dec(composition(identity, permutation))]))
-
-# Sorting the identity into permutation
-while dist != 0:
-
-    # Compute the transformation T(permutation, pattern);
-    # trns = (permutation, pattern, operation, L, R)
-    trns = transformation(permutation, pattern, misc_dec, subseq_map)
-    dist = dist - 1
-
-    # assign permutation and misc_dec for next transformation
-    permutation = trns[0]
-    misc_dec = get_misc_dec(permutation)
-
-    # Derive the next pattern
-    if dist != 0:
-        pat = trns[1]
-        first = pat[0]
-        last = pat[-1]
-        mid = pat[int(len(pat) / 2)]
-
-        # Derive the type of the next pattern by examining the characters at the beginning, the middle, and end.
-        if first == "n" and last == "p" and mid == "p":
-            pattern = ("liTDRL", pat)
-        elif first == "p" and last == "n" and mid == "n":
-            pattern = ("riTDRL", pat)
-        else:
-            pattern = ("TDRL", pat)
+    fmt = args.format
+    if fmt is None:
+        fmt = "tabular" if args.tabular else "verbose"
 
-    # Get next subsequence mapping between misc_dec and pattern
-    subseq_map = subseq_mapping(misc_dec, pattern[1])
+    with profile_stage("output"):
+        write_scenario(scenario, fmt, sys.stdout)
 
+        if fmt == "verbose":
+            t2 = time.time()
+            print("Sorting Scenario computed in " + str(t2 - t1) + "s.")
 
-    # Tabular Output.
-    if args.tabular:
+        sys.stdout.flush()
 
-        if args.identity:
-            # L and R are concatenated so that we can relabel them by identity * LR
-            l_perm = [int(_) for _ in trns[3].strip().split(" ")]
-            r_perm = [int(_) for _ in trns[4].strip().split(" ")]
-            comp = composition(identity, l_perm + r_perm)
-            left = comp[0:len(l_perm)]
-            right = comp[len(l_perm):len(comp)]
 
-            print(trns[2] + "\t" + "( " + stringify(left) + " | " + stringify(right) + " )")
+def run(args):
+    if args.matrix:
+        main_matrix(args)
+        return
 
-            pprint_perm(composition(identity, trns[0]), endl=False)
-            print("\t", end="")
-        else:
-            print(trns[2] + "\t" + "( " + trns[3] + " | " + trns[4] + " )")
-            pprint_perm(permutation, endl=False)
-            print("\t", end="")
+    if args.batch or (args.random and args.count):
+        if args.format is None:
+            args.format = "ndjson"
+        elif args.format in ("verbose", "tabular"):
+            sys.exit("sort.py: error: output format " + args.format + " is not available in batch mode")
+        if args.profile:
+            sys.exit("sort.py: error: --profile is not available in batch mode")
+        main_batch(args)
+        return
 
-    # Verbose Output.
+    identity = None
+
+    # Either take the input permutation, generate a random permutation, or default
+    # to a permutation containing 37 elements in case neither -p nor -r are set.
+    if args.permutation:
+        permutation = [int(x) for x in args.permutation.split(" ")]
+    elif args.random:
+        permutation = random_permutations(1, args.random, args.seed)[0].tolist()
     else:
+        permutation = random_permutations(1, 37, args.seed)[0].tolist()
+
+    # If an identity permutation is specified, the output is for optimally
+    # sorting identity -> permutation
+    if args.identity:
+        identity = [int(x) for x in args.identity.split(" ")]
+
+    if args.profile:
+        with profile() as stats:
+            main_single(args, permutation, identity)
+        print(json.dumps(stats), file=sys.stderr)
+    else:
+        main_single(args, permutation, identity)
+
+
+def main():
+    args = parse_args()
+
+    if args.table:
+        load_distance_table(args.table)
+
+    set_memo_size(args.memo_size)
+    set_memo_max_bytes(args.memo_bytes)
+    if args.memo and os.path.exists(args.memo):
+        load_memo(args.memo)
+
+    run(args)
+
+    # A disabled memo does not overwrite the file
+    if args.memo and get_memo_size() > 0:
+        save_memo(args.memo)
+    if args.memo_stats:
+        print(json.dumps(get_memo_stats()), file=sys.stderr)
+
 
-        # Outputs the last part of a verbose output cell for permutation_k+1
-        # i.e. the TDRL/iTDLR γ_k+1 which creates permutation_k+1 from current permutation_k
-        print()
-
-        # Outputs TDRL/iTDRL : (L|R)
-        print(trns[2] + " γ_" + str(dist + 1) + ": " + "( " + trns[3] + " | " + trns[4] + " )")
-
-        if args.identity:
-            # L and R are concatenated so that we can relabel them by identity * LR
-            l_perm = [int(_) for _ in trns[3].strip().split(" ")]
-            r_perm = [int(_) for _ in trns[4].strip().split(" ")]
-            comp = composition(identity, l_perm+r_perm)
-            left = comp[0:len(l_perm)]
-            right = comp[len(l_perm):len(comp)]
-
-            # Outputs TDRL/iTDRL : (L|R) for relabeled L and R
-            print( trns[2] + " γ_" + str(dist + 1) + ": " +
-                  "( " + stringify(left) + " | " + stringify(right) + " )" + " (relabeled) ")
-
-        print("Permutation_" + str(dist + 1) + " = " + "γ_" + str(dist + 1) + " * " + "Permutation_" + str(dist))
-        print()
-        print("------------------------------------------")
-
-        # Output for permutation_k
-        print()
-        print("Permutation_" + str(dist) + ": ", end="")
-        pprint_perm(permutation)
-
-        print("MISC-Encoding: ", end="")
-        pprint_misc_enc(misc_dec, subseq_map, len(trns[1]))
-
-        print("Pattern      : ", end="")
-        print(trns[1])
-
-        # For the case that a different identity is specified, we relabel the output back to the original permutations.
-        if args.identity:
-
-            # Since we set permutation = identity^-1 * permutation at the beginning,
-            # we relabel by identity * permutation.
-            print("Permutation_" + str(dist) + ": ", end="")
-            pprint_perm(composition(identity, trns[0]),endl=False)
-            print(" (relabeled)")
-
-            # We recompute the misc-decomposition of the relabeled permutation
-            print("MISC-Encoding: ", end="")
-            print("".join([_[0] for _ in get_misc_dec(composition(identity, trns[0]))]))
-
-# Fill last line of table.
-if args.tabular:
-    print("\t\t")
-
-# Print last separator and runtime.
-else:
-    print()
-    print("------------------------------------------")
-    t2 = time.time()
-    print("Sorting Scenario computed in " + str(t2 - t1) + "s.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from lib import *
+from concurrent.futures import ProcessPoolExecutor
+from math import log2, ceil
+import argparse
+import numpy as np
+
+def parse_args():
+    cli_parser = argparse.ArgumentParser(description="Precomputes the TDRL/iTDRL distance and first pattern of " +
+                                                     "every misc-encoding up to a given length.")
+
+    cli_parser.add_argument("-L", "--length", type=int, required=True, help="maximum length of the misc-encodings")
+    cli_parser.add_argument("-o", "--output", type=str, default="distance_table.npy",
+                            help="output .npy file, which is loaded by --table of sort.py and server.py")
+    cli_parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes")
+    cli_parser.add_argument("--chunksize", type=int, default=2 ** 16,
+                            help="number of misc-encodings computed at once")
+    return cli_parser.parse_args()
+
+
+def encoding_negatives(length, start, end):
+    """
+    Returns the misc-encodings of the given length whose bit values are
+    start, ..., end-1 as an (end - start) x length boolean matrix which is True
+    for every n. Bit i of the value is set if character i is n, see table_index.
+    """
+    values = np.arange(start, end, dtype=np.int64)
+    return ((values[:, None] >> np.arange(length, dtype=np.int64)) & 1).astype(bool)
+
+
+def table_entries(length, start, end):
+    """
+    Computes the distance table entries of the misc-encodings of the given length
+    whose bit values are start, ..., end-1.
+
+    As in find_pattern, the patterns of length 2^k and then 2^(k+1) are searched,
+    where k = ceil(log2(length)), for all encodings at once on their runs, see
+    batch_runs and first_patterns. Encodings which match a pattern of length 2^k
+    are not searched again.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of TABLE_DTYPE entries.
+    """
+    k = ceil(log2(length))
+    negative = encoding_negatives(length, start, end)
+    run_lengths, run_offsets = batch_runs(negative.ravel(), np.arange(0, negative.size, length))
+    first_n = negative[:, 0]
+
+    entries = np.empty(end - start, dtype=TABLE_DTYPE)
+    entries["distance"] = k + 1
+    entries["pattern"] = TABLE_NO_PATTERN
+
+    rows = np.arange(end - start)
+    for dist in (k, k + 1):
+        first = first_patterns(run_lengths, run_offsets, first_n, pattern_recipes(dist))
+        found = first >= 0
+        entries["distance"][rows[found]] = dist
+        entries["pattern"][rows[found]] = first[found]
+
+        rows, first_n = rows[~found], first_n[~found]
+        run_lengths, run_offsets = select_runs(run_lengths, run_offsets, ~found)
+
+    return entries
+
+
+def process_entries(path, length, start, end):
+    """
+    Computes the entries of the misc-encodings of the given length whose bit values
+    are start, ..., end-1 in a worker process and writes them to the memory-mapped
+    table in path, see worker_memmap.
+    """
+    table = worker_memmap(path)
+    offset = table_index("p" * length)
+    table[offset + start:offset + end] = table_entries(length, start, end)
+    table.flush()
+
+
+def build_distance_table(length, path, jobs=1, chunksize=2 ** 16):
+    """
+    Computes the distance and first pattern of every misc-encoding of length
+    1, ..., length and stores them as a memory-mapped .npy file.
+
+    The table contains 2^(length+1) - 2 entries of TABLE_DTYPE, in the order of
+    table_index, and is loaded by load_distance_table. Chunks of encodings are
+    processed by jobs worker processes which write their entries into the output
+    file directly.
+
+    Parameters
+    ----------
+    length: int
+        Maximum length of the misc-encodings.
+    path: str
+        Path of the .npy file the table is written to.
+    jobs: int
+        Number of worker processes. For jobs <= 1, entries are computed in the
+        current process.
+    chunksize: int
+        Number of misc-encodings computed at once.
+
+    Returns
+    -------
+    numpy.memmap
+        The distance table, opened read-only.
+    """
+    table = np.lib.format.open_memmap(path, mode="w+", dtype=TABLE_DTYPE, shape=(table_size(length),))
+    chunks = [(l, start, min(start + chunksize, 2 ** l))
+              for l in range(1, length + 1) for start in range(0, 2 ** l, chunksize)]
+
+    if jobs <= 1:
+        for l, start, end in chunks:
+            offset = table_index("p" * l)
+            table[offset + start:offset + end] = table_entries(l, start, end)
+        table.flush()
+        del table
+        return np.load(path, mmap_mode="r")
+
+    table.flush()
+    del table
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for _ in bounded_submit(executor, process_entries, ((path,) + chunk for chunk in chunks), jobs, ordered=False):
+            pass
+
+    return np.load(path, mmap_mode="r")
+
+
+def main():
+    args = parse_args()
+    build_distance_table(args.length, args.output, args.jobs, args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+from batch import *
+import json
+
+
+def test_single_element_lines():
+    for distance_only in (False, True):
+        records = [json.loads(line) for line in run_batch(["1", "-1"], distance_only=distance_only)]
+
+        assert [record["distance"] for record in records] == [0, 1]
+        assert all("error" not in record for record in records)
@@ -0,0 +1,56 @@
+from lib import *
+from exhaustive import *
+from itertools import permutations, product
+import pytest
+
+
+def test_rank_signed_roundtrip():
+    for n in range(1, 5):
+        ranks = []
+        for unsigned in permutations(range(1, n + 1)):
+            for signs in product((1, -1), repeat=n):
+                permutation = [x * s for x, s in zip(unsigned, signs)]
+                rank = rank_signed(permutation)
+                assert unrank_signed(rank, n) == permutation
+                ranks.append(rank)
+
+        assert sorted(ranks) == list(range(count_signed_permutations(n)))
+
+
+def test_encoding_keys_match_misc_encodings():
+    signed = random_permutations(1000, 7, seed=0)
+    keys = encoding_keys(signed)
+    assert [key_encoding(key) for key in keys.tolist()] == batch_misc_encodings(signed)
+
+
+def test_run_exhaustive_totals():
+    for n in range(1, 6):
+        histogram = run_exhaustive(n)
+        assert sum(histogram.values()) == count_signed_permutations(n)
+        assert histogram[0] == 1
+
+
+def test_run_exhaustive_matches_distance():
+    n = 4
+    expected = {}
+    for unsigned in permutations(range(1, n + 1)):
+        for signs in product((1, -1), repeat=n):
+            dist = distance([x * s for x, s in zip(unsigned, signs)])
+            expected[dist] = expected.get(dist, 0) + 1
+
+    assert run_exhaustive(n, max_rows=2 ** n) == expected
+
+
+def test_run_exhaustive_resumes_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    histogram = run_exhaustive(4, max_rows=2 ** 4, checkpoint=path)
+
+    assert load_checkpoint(path, 4, shard_depth(4, 2 ** 4))["histogram"] == histogram
+    assert run_exhaustive(4, max_rows=2 ** 4, checkpoint=path) == histogram
+
+
+def test_shard_depth_minimum():
+    assert shard_depth(4, 2 ** 4) == 3
+    assert shard_depth(4, count_signed_permutations(4)) == 0
+    with pytest.raises(ValueError):
+        shard_depth(4, 2 ** 4 - 1)
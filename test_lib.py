@@ -0,0 +1,106 @@
+from lib import *
+from itertools import product
+import numpy as np
+
+
+def greedy_mapping(misc_encoding, pattern):
+    """
+    Returns the greedy subsequence mapping of subseq_mapping, searched character
+    by character, or an empty dict.
+    """
+    mapping = {}
+    j = 0
+    for i, char in enumerate(misc_encoding):
+        j = pattern.find(char, j)
+        if j == -1:
+            return {}
+        mapping[j] = i
+        j += 1
+    return mapping
+
+
+def all_encodings(max_length):
+    for length in range(1, max_length + 1):
+        for chars in product("pn", repeat=length):
+            yield "".join(chars)
+
+
+def test_recipes_expand_to_patterns():
+    for k in range(6):
+        patterns = get_patterns(k)
+        assert len(patterns) == len(set(patterns))
+        assert all(len(pattern) == 2 ** k for _, pattern in patterns)
+        assert pattern_type(patterns[0][1]) == patterns[0][0]
+
+
+def test_recipe_mapping_matches_subseq_mapping():
+    for misc_encoding in all_encodings(8):
+        misc_dec = [(char,) for char in misc_encoding]
+        for k in range(5):
+            for recipe in pattern_recipes(k):
+                pattern = expand_recipe(recipe)[1]
+                expected = greedy_mapping(misc_encoding, pattern)
+
+                assert subseq_mapping(misc_dec, pattern) == expected
+                assert recipe_mapping(recipe, misc_encoding) == expected
+                assert recipe_subsequence(recipe, misc_encoding) == bool(expected)
+
+
+def test_encoding_distance_matches_pattern_search():
+    for misc_encoding in all_encodings(10):
+        k = (len(misc_encoding) - 1).bit_length()
+        expected = k + 1
+        for _, pattern in get_patterns(k):
+            if greedy_mapping(misc_encoding, pattern):
+                expected = k
+                break
+
+        assert encoding_distance(misc_encoding) == expected
+
+
+def test_batch_distances_match_distance():
+    for n in (1, 2, 5, 37, 200):
+        permutations = random_permutations(500, n, seed=n)
+        encodings, distances = batch_distances(permutations)
+
+        assert encodings == [get_misc_encoding(p) for p in permutations]
+        assert distances.tolist() == [distance(p.tolist()) for p in permutations]
+
+
+def test_identity_has_distance_zero():
+    assert encoding_distance("p") == 0
+    assert distance([1, 2, 3, 4]) == 0
+    assert batch_distances(np.array([[1, 2, 3], [-3, -2, -1]]))[1].tolist() == [0, 1]
+
+
+def test_single_element_permutations():
+    for element, dist in ((1, 0), (-1, 1)):
+        assert get_misc_dec([element]) == get_misc_dec_np([element]) == [("p" if element > 0 else "n", 0, 1)]
+        assert sort_scenario([element]).distance == dist
+        assert distance([element]) == dist
+        assert batch_distances(np.array([[element]]))[1].tolist() == [dist]
+
+
+def test_misc_dec_backends_agree():
+    for n in range(1, 12):
+        for permutation in random_permutations(50, n, seed=n).tolist():
+            assert get_misc_dec(permutation) == get_misc_dec_np(permutation)
+
+
+def test_run_jumps_match_greedy_mapping():
+    rng = np.random.default_rng(0)
+    for k in (7, 8, 9):
+        for _ in range(200):
+            # Few long runs, hence subseq_mapping maps by run-length jumps
+            runs = rng.integers(1, 2 ** k // 4, size=rng.integers(1, 2 ** k // 64 + 1))
+            first = rng.integers(2)
+            misc_encoding = "".join("pn"[(first + i) % 2] * int(r) for i, r in enumerate(runs))
+            assert encoding_run_count(misc_encoding) <= RUN_JUMP_RATIO * 2 ** k
+
+            misc_dec = [(char,) for char in misc_encoding]
+            for recipe in pattern_recipes(k):
+                pattern = expand_recipe(recipe)[1]
+                expected = greedy_mapping(misc_encoding, pattern)
+
+                assert subseq_mapping(misc_dec, pattern) == expected
+                assert recipe_mapping(recipe, misc_encoding) == expected
@@ -0,0 +1,46 @@
+from lib import *
+from batch import run_batch
+
+
+def test_save_and_load_memo(tmp_path):
+    path = str(tmp_path / "memo.json")
+    clear_memo()
+    try:
+        encoding_distance("pnpnn")
+        expected = find_pattern([(char,) for char in "pnp"])
+        entries = get_memo_entries()
+        assert ("pnpnn", 3, None) in entries
+        assert [entry[2] is not None for entry in entries if entry[0] == "pnp"] == [True]
+
+        save_memo(path)
+        clear_memo()
+        load_memo(path)
+        assert get_memo_entries() == entries
+
+        # Both entries are answered from the memo, the pattern is rebuilt from its recipe
+        assert encoding_distance("pnpnn") == 3
+        assert find_pattern([(char,) for char in "pnp"]) == expected
+        assert get_memo_stats()["misses"] == 0
+    finally:
+        clear_memo()
+
+
+def test_batch_workers_return_memo_entries(tmp_path):
+    path = str(tmp_path / "memo.json")
+    lines = [" ".join(map(str, permutation)) for permutation in random_permutations(100, 12, seed=0).tolist()]
+    clear_memo()
+    try:
+        list(run_batch(lines, distance_only=True))
+        expected = {entry[0] for entry in get_memo_entries()}
+
+        clear_memo()
+        records = list(run_batch(lines, jobs=2, chunksize=8, distance_only=True, memo_path=path))
+        assert len(records) == len(lines)
+        assert {entry[0] for entry in get_memo_entries()} == expected
+
+        save_memo(path)
+        clear_memo()
+        load_memo(path)
+        assert {entry[0] for entry in get_memo_entries()} == expected
+    finally:
+        clear_memo()
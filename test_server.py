@@ -0,0 +1,28 @@
+from server import *
+import asyncio
+
+
+def submit_all(server, requests):
+    async def gather():
+        return await asyncio.gather(*[server.submit(request) for request in requests])
+    return asyncio.run(gather())
+
+
+def test_distance_requests_store_encodings():
+    requests = [{"type": "distance", "permutation": [2, 4, 7, -8, 3, -1, -6, -5]},
+                {"type": "distance", "permutation": [2, 4, 7, -8, 3, -1, -6, -5], "identity": [1, 3, 2, 4, 5, 6, 7, 8]},
+                {"type": "distance", "encoding": "pnpn"},
+                {"type": "distance", "permutation": "2 1"}]
+
+    for jobs in (0, 2):
+        clear_memo()
+        server = SortServer(jobs)
+        try:
+            responses = submit_all(server, requests)
+        finally:
+            server.close()
+
+        assert responses[:3] == [{"distance": 3}, {"distance": 3}, {"distance": 2}]
+        assert "error" in responses[3]
+        assert memo_lookup("pnpnn", need_pattern=False)[0] == 3
+    clear_memo()
@@ -0,0 +1,32 @@
+from lib import *
+from table import build_distance_table
+from itertools import product
+
+
+def results(encodings, lengths):
+    """
+    Returns the distances and patterns of all encodings and the batch distances
+    of random permutations of the given lengths, searched on an empty memo.
+    """
+    clear_memo()
+    return ([encoding_distance(encoding) for encoding in encodings],
+            [find_pattern([(char,) for char in encoding]) for encoding in encodings],
+            [batch_distances(random_permutations(200, n, seed=n))[1].tolist() for n in lengths])
+
+
+def test_table_matches_search(tmp_path):
+    encodings = ["".join(chars) for length in range(1, 10) for chars in product("pn", repeat=length)]
+    lengths = (1, 2, 5, 8, 12, 40)
+    searched = results(encodings, lengths)
+
+    for jobs in (1, 2):
+        path = str(tmp_path / ("table_" + str(jobs) + ".npy"))
+        build_distance_table(8, path, jobs=jobs, chunksize=64)
+        try:
+            assert load_distance_table(path) == 8
+            assert expand_recipe(pattern_recipes(2)[table_lookup("pnpn")[1]])[1] == "pnpn"
+            assert table_lookup("p" * 9) is None
+            assert results(encodings, lengths) == searched
+        finally:
+            load_distance_table(None)
+            clear_memo()
@@ -0,0 +1,142 @@
+from lib import *
+from writers import *
+import io
+
+PERMUTATION = [2, 4, 7, -8, 3, -1, -6, -5]
+IDENTITY = [1, 3, 2, 4, 5, 6, 7, 8]
+
+# Output of sort.py -p "2 4 7 -8 3 -1 -6 -5" (verbose) and with -t (tabular), without identity and with
+# -i "1 3 2 4 5 6 7 8" (relabeled), as written before the writers were added
+VERBOSE = "".join([
+    "\n",
+    "\n",
+    "Distance: 3 TDRL/iTDRL\n",
+    "----------------------\n",
+    "\n",
+    "Permutation_3: ( 2 4 7 -8 3 -1 -6 -5 )\n",
+    "MISC-Encoding: p n p nn\n",
+    "Pattern      : ppnnppnn\n",
+    "\n",
+    "TDRL γ_3: ( 2 4 7 -8  | 3 -1 -6 -5  )\n",
+    "Permutation_3 = γ_3 * Permutation_2\n",
+    "\n",
+    "------------------------------------------\n",
+    "\n",
+    "Permutation_2: ( 2 3 4 7 -8 -1 -6 -5 )\n",
+    "MISC-Encoding: p nn\n",
+    "Pattern      : ppnn\n",
+    "\n",
+    "riTDRL γ_2: ( 2 3 4 7  | 5 6 1 8  )\n",
+    "Permutation_2 = γ_2 * Permutation_1\n",
+    "\n",
+    "------------------------------------------\n",
+    "\n",
+    "Permutation_1: ( 2 3 4 5 6 7 1 8 )\n",
+    "MISC-Encoding: pp\n",
+    "Pattern      : pp\n",
+    "\n",
+    "TDRL γ_1: ( 2 3 4 5 6 7  | 1 8  )\n",
+    "Permutation_1 = γ_1 * Permutation_0\n",
+    "\n",
+    "------------------------------------------\n",
+    "\n",
+    "Permutation_0: ( 1 2 3 4 5 6 7 8 )\n",
+    "MISC-Encoding: p\n",
+    "Pattern      : p\n",
+    "\n",
+    "------------------------------------------\n",
+])
+
+
+TABULAR = "".join([
+    "Permutation_k\tTDRL/iTDRL\tγ_k\n",
+    "( 2 4 7 -8 3 -1 -6 -5 )\tTDRL\t( 2 4 7 -8  | 3 -1 -6 -5  )\n",
+    "( 2 3 4 7 -8 -1 -6 -5 )\triTDRL\t( 2 3 4 7  | 5 6 1 8  )\n",
+    "( 2 3 4 5 6 7 1 8 )\tTDRL\t( 2 3 4 5 6 7  | 1 8  )\n",
+    "( 1 2 3 4 5 6 7 8 )\t\t\t\n",
+])
+
+
+VERBOSE_RELABELED = "".join([
+    "\n",
+    "\n",
+    "Distance: 3 TDRL/iTDRL\n",
+    "----------------------\n",
+    "\n",
+    "Permutation_3: ( 3 4 7 -8 2 -1 -6 -5 )\n",
+    "MISC-Encoding: p n p nn\n",
+    "Pattern      : ppnnppnn\n",
+    "Permutation_3: ( 2 4 7 -8 3 -1 -6 -5 ) (relabeled)\n",
+    "MISC-Encoding: pnpnn\n",
+    "\n",
+    "TDRL γ_3: ( 3 4 7 -8  | 2 -1 -6 -5  )\n",
+    "TDRL γ_3: ( 2 4 7 -8  | 3 -1 -6 -5  ) (relabeled) \n",
+    "Permutation_3 = γ_3 * Permutation_2\n",
+    "\n",
+    "------------------------------------------\n",
+    "\n",
+    "Permutation_2: ( 2 3 4 7 -8 -1 -6 -5 )\n",
+    "MISC-Encoding: p nn\n",
+    "Pattern      : ppnn\n",
+    "Permutation_2: ( 3 2 4 7 -8 -1 -6 -5 ) (relabeled)\n",
+    "MISC-Encoding: ppnn\n",
+    "\n",
+    "riTDRL γ_2: ( 2 3 4 7  | 5 6 1 8  )\n",
+    "riTDRL γ_2: ( 3 2 4 7  | 5 6 1 8  ) (relabeled) \n",
+    "Permutation_2 = γ_2 * Permutation_1\n",
+    "\n",
+    "------------------------------------------\n",
+    "\n",
+    "Permutation_1: ( 2 3 4 5 6 7 1 8 )\n",
+    "MISC-Encoding: pp\n",
+    "Pattern      : pp\n",
+    "Permutation_1: ( 3 2 4 5 6 7 1 8 ) (relabeled)\n",
+    "MISC-Encoding: ppp\n",
+    "\n",
+    "TDRL γ_1: ( 2 3 4 5 6 7  | 1 8  )\n",
+    "TDRL γ_1: ( 3 2 4 5 6 7  | 1 8  ) (relabeled) \n",
+    "Permutation_1 = γ_1 * Permutation_0\n",
+    "\n",
+    "------------------------------------------\n",
+    "\n",
+    "Permutation_0: ( 1 2 3 4 5 6 7 8 )\n",
+    "MISC-Encoding: p\n",
+    "Pattern      : p\n",
+    "Permutation_0: ( 1 3 2 4 5 6 7 8 ) (relabeled)\n",
+    "MISC-Encoding: pp\n",
+    "\n",
+    "------------------------------------------\n",
+])
+
+
+TABULAR_RELABELED = "".join([
+    "Permutation_k\tTDRL/iTDRL\tγ_k\n",
+    "( 2 4 7 -8 3 -1 -6 -5 )\tTDRL\t( 2 4 7 -8  | 3 -1 -6 -5  )\n",
+    "( 3 2 4 7 -8 -1 -6 -5 )\triTDRL\t( 3 2 4 7  | 5 6 1 8  )\n",
+    "( 3 2 4 5 6 7 1 8 )\tTDRL\t( 3 2 4 5 6 7  | 1 8  )\n",
+    "( 1 3 2 4 5 6 7 8 )\t\t\t\n",
+])
+
+
+
+def formatted(fmt, identity=None):
+    stream = io.StringIO()
+    write_scenario(sort_scenario(PERMUTATION, identity), fmt, stream)
+    return stream.getvalue()
+
+
+def test_verbose_output():
+    assert formatted("verbose") == VERBOSE
+    assert formatted("verbose", IDENTITY) == VERBOSE_RELABELED
+
+
+def test_tabular_output():
+    assert formatted("tabular") == TABULAR
+    assert formatted("tabular", IDENTITY) == TABULAR_RELABELED
+
+
+def test_lazy_scenario_output():
+    for fmt in ("verbose", "tabular"):
+        stream = io.StringIO()
+        write_scenario(sort_scenario(PERMUTATION, IDENTITY, lazy=True), fmt, stream)
+        assert stream.getvalue() == formatted(fmt, IDENTITY)
@@ -0,0 +1,240 @@
+from lib import *
+import csv
+import io
+import json
+import sys
+
+
+def format_operation(left, right):
+    """
+    Returns the representation of the bipartition (L|R) of a TDRL/iTDRL, i.e.
+    "( 2 4  | 3 1  )".
+    """
+    return "( " + stringify(left) + " | " + stringify(right) + " )"
+
+
+def format_verbose(scenario):
+    """
+    Formats a sorting scenario in the verbose text format of sort.py.
+
+    Parameters
+    ----------
+    scenario: Scenario
+        Sorting scenario as returned by sort_scenario. steps may be a generator.
+
+    Returns
+    -------
+    generator
+        Yields the output as one string per permutation_k.
+    """
+    identity = scenario.identity
+
+    yield "\n\nDistance: " + str(scenario.distance) + " TDRL/iTDRL\n----------------------\n"
+
+    for step in scenario.steps:
+
+        # Output for permutation_k
+        lines = ["",
+                 "Permutation_" + str(step.k) + ": " + format_perm(step.permutation),
+                 "MISC-Encoding: " + format_misc_enc(step.misc_dec, step.mapping, len(step.pattern[1])),
+                 "Pattern      : " + step.pattern[1]]
+
+        # For the case that a different identity is specified, the steps contain the
+        # permutations relabeled back to the original permutations, i.e. identity * permutation.
+        if identity:
+            lines.append("Permutation_" + str(step.k) + ": " + format_perm(step.relabeled) + " (relabeled)")
+            lines.append("MISC-Encoding: " + step.relabeled_encoding)
+
+        if step.k == 0:
+            yield "\n".join(lines) + "\n"
+            break
+
+        # Outputs the last part of a verbose output cell for permutation_k
+        # i.e. the TDRL/iTDLR γ_k which creates permutation_k from permutation_k-1
+        lines.append("")
+        lines.append(step.operation + " γ_" + str(step.k) + ": " + format_operation(step.L, step.R))
+
+        if identity:
+            lines.append(step.operation + " γ_" + str(step.k) + ": " +
+                         format_operation(step.relabeled_L, step.relabeled_R) + " (relabeled) ")
+
+        lines.append("Permutation_" + str(step.k) + " = " + "γ_" + str(step.k) + " * " + "Permutation_" + str(step.k - 1))
+        lines.append("")
+        lines.append("------------------------------------------")
+        yield "\n".join(lines) + "\n"
+
+    yield "\n------------------------------------------\n"
+
+
+def format_tabular(scenario):
+    """
+    Formats a sorting scenario in the tabular text format of sort.py -t, i.e. one
+    line per permutation_k which contains the permutation and the TDRL/iTDRL γ_k.
+
+    Returns
+    -------
+    generator
+        Yields the output as one string per line.
+    """
+    identity = scenario.identity
+
+    yield "Permutation_k\tTDRL/iTDRL\tγ_k\n"
+
+    for step in scenario.steps:
+
+        if identity:
+            # Output relabeled permutation
+            line = format_perm(step.relabeled) + "\t"
+        else:
+            line = format_perm(step.permutation) + "\t"
+
+        if step.k == 0:
+            # Fill last line of table.
+            yield line + "\t\t\n"
+            break
+
+        if identity:
+            left, right = step.relabeled_L, step.relabeled_R
+        else:
+            left, right = step.L, step.R
+
+        yield line + step.operation + "\t" + format_operation(left, right) + "\n"
+
+
+def step_record(scenario, step):
+    """
+    Returns a dict representation of a single step of a sorting scenario.
+
+    Contains k, the permutation, its misc-encoding, the pattern, and the
+    TDRL/iTDRL γ_k, which is None for permutation_0. If the scenario has an
+    identity, the relabeled permutation, L and R are included as well.
+    """
+    record = {"k": step.k,
+              "permutation": list(step.permutation),
+              "encoding": "".join([_[0] for _ in step.misc_dec]),
+              "pattern": step.pattern[1],
+              "operation": step.operation,
+              "L": None if step.L is None else list(step.L),
+              "R": None if step.R is None else list(step.R)}
+
+    if scenario.identity:
+        record["relabeled_permutation"] = list(step.relabeled)
+        record["relabeled_L"] = None if step.relabeled_L is None else list(step.relabeled_L)
+        record["relabeled_R"] = None if step.relabeled_R is None else list(step.relabeled_R)
+
+    return record
+
+
+def _row_fields(scenario):
+    """
+    Returns the column names of step rows, see step_record.
+    """
+    fields = ["k", "permutation", "encoding", "pattern", "operation", "L", "R"]
+    if scenario.identity:
+        fields += ["relabeled_permutation", "relabeled_L", "relabeled_R"]
+    return fields
+
+
+def _row(record, fields):
+    """
+    Returns the values of a step record as strings; lists are space separated.
+    """
+    row = []
+    for field in fields:
+        value = record[field]
+        if value is None:
+            row.append("")
+        elif isinstance(value, list):
+            row.append(" ".join(map(str, value)))
+        else:
+            row.append(str(value))
+    return row
+
+
+def format_ndjson(scenario):
+    """
+    Formats a sorting scenario as one JSON object per step, see step_record.
+
+    Returns
+    -------
+    generator
+        Yields the output as one string per line.
+    """
+    for step in scenario.steps:
+        yield json.dumps(step_record(scenario, step), separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+def format_tsv(scenario):
+    """
+    Formats a sorting scenario as tab separated values with a header line and one
+    line per step, see step_record. Permutations, L and R are space separated.
+
+    Returns
+    -------
+    generator
+        Yields the output as one string per line.
+    """
+    fields = _row_fields(scenario)
+    yield "\t".join(fields) + "\n"
+
+    for step in scenario.steps:
+        yield "\t".join(_row(step_record(scenario, step), fields)) + "\n"
+
+
+def format_csv(scenario):
+    """
+    Formats a sorting scenario as comma separated values with a header line and
+    one line per step, see format_tsv.
+
+    Returns
+    -------
+    generator
+        Yields the output as one string per line.
+    """
+    fields = _row_fields(scenario)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    writer.writerow(fields)
+    for step in scenario.steps:
+        writer.writerow(_row(step_record(scenario, step), fields))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header of a scenario without steps is still written
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Output formats for single sorting scenarios
+WRITERS = {"verbose": format_verbose,
+           "tabular": format_tabular,
+           "ndjson": format_ndjson,
+           "tsv": format_tsv,
+           "csv": format_csv}
+
+
+def write_scenario(scenario, fmt="verbose", stream=None):
+    """
+    Writes a sorting scenario to a stream.
+
+    Each step is formatted once into a string which is written with a single
+    write call, hence steps of a lazy scenario are written as soon as they are
+    computed.
+
+    Parameters
+    ----------
+    scenario: Scenario
+        Sorting scenario as returned by sort_scenario.
+    fmt: str
+        One of the formats in WRITERS, i.e. "verbose" (the default output of
+        sort.py), "tabular" (sort.py -t), "ndjson", "tsv" or "csv".
+    stream: file
+        Text stream the scenario is written to, defaults to sys.stdout.
+    """
+    if stream is None:
+        stream = sys.stdout
+
+    for chunk in WRITERS[fmt](scenario):
+        stream.write(chunk)